@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+import httpx
+from config import Config
+from bs4_small_scraper import HEADERS, describe_source, extract_text_from_html, is_google_domain
+from streaming_html import StreamingTextCollector, is_text_content_type
+from page_cache import get_page_cache
+from domain_health import get_domain_health
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class AsyncFetchEngine:
+    """Fetches pages on one event loop, with a global and a per-host concurrency limit"""
+
+    def __init__(self, max_concurrency=None, per_host_limit=None, http2=None, timeout=None):
+        self.max_concurrency = max_concurrency or Config.SCRAPER_MAX_CONCURRENCY
+        self.per_host_limit = per_host_limit or Config.SCRAPER_PER_HOST_LIMIT
+        self.timeout = timeout or Config.SCRAPER_TIMEOUT
+        if http2 is None:
+            http2 = Config.SCRAPER_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("HTTP/2 needs the h2 package (pip install httpx[http2]), using HTTP/1.1")
+                http2 = False
+
+        # The client ignores its own limits and http2 settings when given a transport, they go on the transport
+        transport = httpx.AsyncHTTPTransport(
+            http2=http2,
+            retries=Config.HTTP_RETRIES,
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+            ),
+        )
+        self.client = httpx.AsyncClient(
+            headers=HEADERS,
+            follow_redirects=True,
+            timeout=self.timeout,
+            transport=transport,
+        )
+        self._global_limit = asyncio.Semaphore(self.max_concurrency)
+        self._host_limits = {}
+
+    def _host_limit(self, host):
+        """Semaphore limiting the requests in flight to one host"""
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_limits[host]
+
+    async def get_text_from_url(self, url, max_chars=None):
+        """Extract plain text from a URL, at least max_chars of it when the page has them"""
+        host = urlparse(url).netloc
+        domain_health = get_domain_health()
+        timeout = domain_health.timeout_for(url) if domain_health else self.timeout
+
+        # Fresh cached pages are served without any network call, stale ones are revalidated.
+        # SQLite may wait on another process's lock, so it's used from a thread.
+        page_cache = get_page_cache()
+        cached = await asyncio.to_thread(page_cache.lookup, url, max_chars) if page_cache else None
+        if cached is not None and cached.fresh:
+            await asyncio.to_thread(page_cache.record, "hit")
+            logger.info(f"Page cache hit for {url}")
+            return cached.text
+
+        outcome = "miss"
+        status = error = None
+        chars = 0
+        start = None
+        cancelled = False
+        try:
+            async with self._global_limit, self._host_limit(host):
+                logger.info(f"Requesting content from {url}")
+                # Timed from here, waiting for a free slot says nothing about the domain
+                start = time.perf_counter()
+                headers = cached.conditional_headers() if cached else None
+                async with self.client.stream("GET", url, headers=headers, timeout=timeout) as response:
+                    status = response.status_code
+                    if cached is not None and response.status_code == 304:
+                        outcome = "revalidated"
+                        await asyncio.to_thread(page_cache.revalidated, url, cached, response.headers)
+                        logger.info(f"Page cache revalidated {url}")
+                        chars = len(cached.text)
+                        return cached.text
+                    response.raise_for_status()
+
+                    if Config.SCRAPER_STREAMING:
+                        text, complete = await self._read_streaming_text(url, response, max_chars)
+                        if text is None:
+                            return None
+                    else:
+                        await response.aread()
+                        html = response.text
+            if not Config.SCRAPER_STREAMING:
+                # Parsing is CPU work, keep it off the event loop
+                text, complete = await asyncio.to_thread(extract_text_from_html, html), True
+
+            if page_cache is not None:
+                await asyncio.to_thread(page_cache.store, url, text, response.headers, complete, max_chars)
+            logger.info(f"Successfully extracted {len(text)} chars from {url}")
+            chars = len(text)
+            return text
+        except asyncio.CancelledError:
+            # Dropped by the scheduler once the budget is full or the deadline passed
+            cancelled = True
+            raise
+        except httpx.HTTPError as e:
+            error = classify_httpx_error(e)
+            logger.error(f"Error fetching {url}: {e}")
+            return None
+        except Exception as e:
+            error = "error"
+            logger.error(f"Unexpected error processing {url}: {e}")
+            return None
+        finally:
+            # A cancelled fetch is not counted, its short elapsed time isn't a latency sample
+            if not cancelled:
+                if page_cache is not None:
+                    await asyncio.to_thread(page_cache.record, outcome)
+                if domain_health is not None and start is not None:
+                    await asyncio.to_thread(domain_health.record, url, time.perf_counter() - start, status, error,
+                                            chars, timeout)
+
+    async def _read_streaming_text(self, url, response, max_chars):
+        """Parse the body chunk by chunk with a streaming_html.StreamingTextCollector, stopping at max_chars
+        of text or MAX_BYTES_PER_URL. Returns (text, complete), or (None, False) for non-text content types
+        """
+        # Reject PDFs, images, videos... before downloading them
+        content_type = response.headers.get('Content-Type')
+        if not is_text_content_type(content_type):
+            logger.info(f"Skipping {url}: unsupported content type {content_type}")
+            return None, False
+
+        # Chunks are small, parsing them on the event loop is cheaper than a thread hop each
+        collector = StreamingTextCollector(content_type, max_chars, Config.MAX_BYTES_PER_URL)
+        async for chunk in response.aiter_bytes(Config.SCRAPER_CHUNK_SIZE):
+            if collector.feed(chunk):
+                break
+        text = collector.get_text()
+        collector.log_stats(url)
+        return text, collector.complete
+
+    async def process_url(self, url_info, source_char_limit):
+        """Process a single URL and return the extracted content"""
+        url, description = url_info
+        netloc, source_info = describe_source(url, description)
+
+        # Skip Google domains
+        if is_google_domain(netloc):
+            logger.info(f"Skipping Google domain: {netloc}")
+            return None
+
+        content = await self.get_text_from_url(url, max_chars=source_char_limit)
+        if content is None:
+            return None
+        return (source_info, content[:source_char_limit])
+
+def classify_httpx_error(e):
+    """Error kind recorded in the domain health stats, see classify_request_error"""
+    if isinstance(e, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(e, httpx.TransportError):
+        return "connection"
+    if isinstance(e, httpx.HTTPStatusError):
+        return "http"
+    return "request"
+
+# One engine (and HTTP client) per event loop, kept alive across API requests
+_engines = {}
+_engines_lock = threading.Lock()
+
+def get_engine():
+    """Return the fetch engine of the running event loop"""
+    loop = asyncio.get_running_loop()
+    with _engines_lock:
+        if loop not in _engines:
+            _engines[loop] = AsyncFetchEngine()
+        return _engines[loop]
+
+async def fetch_all(scheduler, source_char_limit):
+    """Async backend: process URLs concurrently as the scheduler starts them, until it is done or expired"""
+    engine = get_engine()
+    tasks = {}
+    
+    async def process(idx, url_info):
+        scheduler.mark_started(idx)
+        try:
+            return await engine.process_url(url_info, source_char_limit)
+        except Exception as e:
+            logger.error(f"Error processing URL at index {idx}: {e}")
+            return None
+    
+    def start(starts):
+        for idx, url_info in starts:
+            tasks[asyncio.create_task(process(idx, url_info))] = idx
+    
+    try:
+        start(scheduler.initial())
+        while tasks and not scheduler.done and not scheduler.expired:
+            # Wake up on results, on the deadline and when a fetch may have become slow
+            finished, _ = await asyncio.wait(
+                tasks, timeout=scheduler.wait_timeout(tasks.values()), return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in finished:
+                idx = tasks.pop(task)
+                start(scheduler.on_result(idx, task.result()))
+            if not scheduler.done and not scheduler.expired:
+                start(scheduler.hedges(tasks.values()))
+    finally:
+        scheduler.finish(list(tasks.values()))
+        # Don't wait for fetches whose result can't be used anymore
+        if tasks:
+            logger.info(f"Cancelling {len(tasks)} outstanding fetches")
+        for task in tasks:
+            task.cancel()
+
+# Event loop for synchronous callers (CLI, thread pools), running in a daemon thread
+_background_loop = None
+_background_loop_lock = threading.Lock()
+
+def run_in_background_loop(coro):
+    """Run a coroutine on the shared background event loop and wait for its result"""
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(target=_background_loop.run_forever, name="scraper-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop).result()
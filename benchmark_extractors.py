@@ -0,0 +1,95 @@
+"""
+Benchmark the HTML-to-text extractors over a local corpus of saved pages, with output parity against bs4
+"""
+import argparse
+import glob
+import hashlib
+import logging
+import os
+import time
+from urllib.parse import urlparse
+from bs4_small_scraper import get_http_session
+from text_extractors import EXTRACTORS, get_extractor
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+def fetch_pages(urls, corpus_dir):
+    """Save the HTML of each URL in the corpus directory"""
+    os.makedirs(corpus_dir, exist_ok=True)
+    for url in urls:
+        try:
+            response = get_http_session().get(url, timeout=10)
+            response.raise_for_status()
+        except Exception as e:
+            logger.error(f"Could not fetch {url}: {e}")
+            continue
+        name = f"{urlparse(url).netloc}_{hashlib.sha1(url.encode()).hexdigest()[:10]}.html"
+        with open(os.path.join(corpus_dir, name), 'w', encoding='utf-8') as f:
+            f.write(response.text)
+        print(f"Saved {url} as {name}")
+
+def load_corpus(corpus_dir):
+    """Return the decoded pages of the corpus directory"""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(corpus_dir, "*.htm*"))):
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            pages.append(f.read())
+    return pages
+
+def run_extractor(extractor_class, pages, chunk_size=None, max_chars=None):
+    """Extract every page, whole or fed in chunks like the streaming scraper, return texts and seconds"""
+    texts = []
+    start = time.perf_counter()
+    for html in pages:
+        if chunk_size is None:
+            texts.append(extractor_class.extract(html))
+            continue
+        extractor = extractor_class(max_chars)
+        for i in range(0, len(html), chunk_size):
+            extractor.feed(html[i:i + chunk_size])
+            if extractor.enough:
+                break
+        texts.append(extractor.close())
+    return texts, time.perf_counter() - start
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Compare the throughput and output of the text extractors")
+    parser.add_argument("--corpus", "-c", default="html_corpus", help="Directory of saved .html pages")
+    parser.add_argument("--fetch", "-f", nargs="+", help="Save these URLs in the corpus first")
+    parser.add_argument("--extractors", "-e", nargs="+", default=list(EXTRACTORS), help="Extractors to compare")
+    parser.add_argument("--rounds", "-r", type=int, default=3, help="Passes over the corpus, the fastest is kept")
+    parser.add_argument("--chunk-size", type=int, help="Feed pages in chunks of this many characters instead of whole")
+    parser.add_argument("--max-chars", type=int, help="With --chunk-size, stop once this many characters were collected")
+    parser.add_argument("--prefix", type=int, default=500, help="Length of the text prefix compared for prefix parity")
+    args = parser.parse_args()
+
+    if args.fetch:
+        fetch_pages(args.fetch, args.corpus)
+
+    pages = load_corpus(args.corpus)
+    if not pages:
+        parser.error(f"No .html pages in {args.corpus}, save some there or use --fetch")
+    corpus_mb = sum(len(html.encode('utf-8')) for html in pages) / (1024 * 1024)
+    print(f"Corpus: {len(pages)} pages, {corpus_mb:.1f} MB")
+
+    reference, _ = run_extractor(get_extractor("bs4"), pages)
+    print(f"{'extractor':<10} {'pages/s':>9} {'MB/s':>8} {'identical':>10} {'prefix ok':>10}")
+    for name in args.extractors:
+        extractor_class = get_extractor(name)
+        best = None
+        for _ in range(args.rounds):
+            texts, seconds = run_extractor(extractor_class, pages, args.chunk_size, args.max_chars)
+            best = seconds if best is None else min(best, seconds)
+
+        # With max_chars the output is a prefix of the full text, compare what both have
+        identical = sum(
+            text == ref if args.max_chars is None else ref.startswith(text)
+            for text, ref in zip(texts, reference)
+        )
+        prefix_ok = sum(text[:args.prefix] == ref[:args.prefix] for text, ref in zip(texts, reference))
+        print(f"{name:<10} {len(pages) / best:>9.1f} {corpus_mb / best:>8.2f} "
+              f"{identical / len(pages):>10.1%} {prefix_ok / len(pages):>10.1%}")
@@ -0,0 +1,72 @@
+"""
+Benchmark per-URL latency of the scraper with a fresh connection per URL vs the shared session
+"""
+import argparse
+import logging
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from bs4_small_scraper import HEADERS, get_http_session
+
+PAGE = ("<html><head><title>Benchmark page</title></head><body>"
+        + "<p>Some visible text for the scraper to extract.</p>" * 200
+        + "</body></html>").encode("utf-8")
+
+class PageHandler(BaseHTTPRequestHandler):
+    """Serves the same HTML page on every path, with keep-alive"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server():
+    """Start the local server in a background thread and return its base URL"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def measure(fetch, base_url, count):
+    """Fetch count URLs one after the other, return per-URL latencies in ms"""
+    latencies = []
+    for i in range(count):
+        start = time.perf_counter()
+        response = fetch(f"{base_url}/page/{i}")
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Compare fresh connections with the shared scraper session")
+    parser.add_argument("--count", "-n", type=int, default=500, help="URLs fetched per mode")
+    parser.add_argument("--url", "-u", help="Base URL of an existing server instead of the local one")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        server, base_url = start_server()
+
+    modes = {
+        "requests.get": lambda url: requests.get(url, headers=HEADERS, timeout=10),
+        "shared session": lambda url: get_http_session().get(url, timeout=10),
+    }
+    print(f"{'mode':<16} {'mean (ms)':>10} {'median (ms)':>12} {'p90 (ms)':>10}")
+    for name, fetch in modes.items():
+        latencies = measure(fetch, base_url, args.count)
+        p90 = statistics.quantiles(latencies, n=10)[-1]
+        print(f"{name:<16} {statistics.mean(latencies):>10.2f} {statistics.median(latencies):>12.2f} {p90:>10.2f}")
+
+    if server is not None:
+        server.shutdown()
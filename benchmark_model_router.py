@@ -0,0 +1,134 @@
+"""
+Benchmark analysis latency with a single pinned model vs the model router, with and without hedging,
+against local mock OpenAI-compatible servers with configurable latency, tail and error rate
+"""
+import argparse
+import json
+import logging
+import random
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import llm_analysis
+from config import Config
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class MockModelHandler(BaseHTTPRequestHandler):
+    """Answers chat completions after a random delay, or with a 429 rate limit error"""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        profile = self.server.profile
+        if random.random() < profile["error_rate"]:
+            self._send_json(429, {"error": {"message": "Rate limited", "code": 429}})
+            return
+        delay = profile["latency"] * random.uniform(0.8, 1.2)
+        if random.random() < profile["tail_rate"]:
+            delay = profile["tail_latency"]
+        time.sleep(delay)
+        self._send_json(200, {
+            "id": "mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": f"Analysis by {body['model']}"},
+                "finish_reason": "stop",
+            }],
+        })
+
+    def _send_json(self, status, data):
+        payload = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        try:
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # The router cancelled this request after a hedge won
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+def parse_profile(spec):
+    """name:latency[:tail_rate:tail_latency[:error_rate]], seconds and shares"""
+    name, *values = spec.split(":")
+    values = [float(value) for value in values] + [0.0] * (4 - len(values))
+    return {"name": name, "latency": values[0], "tail_rate": values[1], "tail_latency": values[2], "error_rate": values[3]}
+
+def start_server(profile):
+    """Start a mock model server in a background thread and return its base URL"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockModelHandler)
+    server.profile = profile
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+def run(count, **kwargs):
+    """Run count analyses one after the other, return latencies in seconds and the number of errors"""
+    latencies = []
+    errors = 0
+    for i in range(count):
+        start = time.perf_counter()
+        result = llm_analysis.get_llm_analysis(f"Content {i}", use_cache=False, **kwargs)
+        latencies.append(time.perf_counter() - start)
+        if result.startswith("Error processing"):
+            errors += 1
+    return latencies, errors
+
+def print_row(mode, latencies, errors):
+    ordered = sorted(latencies)
+    percentile = lambda fraction: ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+    print(f"{mode:<16} {percentile(0.5):>8.0f} {percentile(0.9):>8.0f} {percentile(0.99):>8.0f} "
+          f"{statistics.mean(latencies) * 1000:>8.0f} {errors:>7}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Compare a pinned model with the model router over mock servers")
+    parser.add_argument("--models", "-m", nargs="+",
+                        default=["fast:0.08:0.08:1.0:0.05", "steady:0.15", "flaky:0.05:0:0:0.5"],
+                        help="Mock models as name:latency[:tail_rate:tail_latency[:error_rate]]")
+    parser.add_argument("--count", "-n", type=int, default=100, help="Analyses per mode")
+    parser.add_argument("--retries", type=int, default=0, help="Client retries per model (Config.LLM_MAX_RETRIES)")
+    parser.add_argument("--hedge-min-delay", type=float, default=0.05, help="Config.MODEL_HEDGE_MIN_DELAY, in seconds")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the mock latencies and errors")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    Config.LLM_MAX_RETRIES = args.retries
+    Config.MODEL_HEDGE_MIN_DELAY = args.hedge_min_delay
+    # The router warns on every failed request, expected here
+    logging.getLogger("llm_analysis").setLevel(logging.CRITICAL)
+    profiles = [parse_profile(spec) for spec in args.models]
+    servers = [start_server(profile) for profile in profiles]
+    candidates = [{"model": profile["name"], "base_url": base_url, "api_key": "mock"}
+                  for profile, (_, base_url) in zip(profiles, servers)]
+
+    print(f"{args.count} analyses per mode, latencies in ms")
+    print(f"{'mode':<16} {'p50':>8} {'p90':>8} {'p99':>8} {'mean':>8} {'errors':>7}")
+    for candidate in candidates:
+        latencies, errors = run(args.count, model=candidate["model"], base_url=candidate["base_url"],
+                                api_key=candidate["api_key"])
+        print_row(candidate["model"], latencies, errors)
+
+    Config.MODEL_CANDIDATES = candidates
+    for mode, hedging in (("router", False), ("router+hedge", True)):
+        # A fresh router per mode, so each one learns from scratch
+        llm_analysis._model_router = None
+        Config.MODEL_HEDGING = hedging
+        latencies, errors = run(args.count)
+        print_row(mode, latencies, errors)
+        router_stats = llm_analysis.get_model_router().stats()
+        shares = ", ".join(f"{label} {stats['requests']}" for label, stats in router_stats["models"].items())
+        print(f"{'':<16} requests: {shares}, hedges: {router_stats['hedges']} ({router_stats['hedge_wins']} won)")
+
+    for server, _ in servers:
+        server.shutdown()
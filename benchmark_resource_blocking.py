@@ -0,0 +1,81 @@
+"""
+Benchmark page-load time and browser memory with resource blocking on and off
+"""
+import argparse
+import logging
+import os
+import statistics
+import time
+from config import Config
+from selenium_lens_scraper import setup_anti_detection_driver
+from page_readiness import wait_for_document_ready
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+def process_tree_rss(root_pid):
+    """Sum the resident memory (in MB) of a process and all its descendants, read from /proc"""
+    children = {}
+    rss_kb = {}
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                # The command name can contain spaces, fields start after the closing parenthesis
+                fields = f.read().rsplit(")", 1)[1].split()
+            with open(f"/proc/{pid}/status") as f:
+                rss_line = next((line for line in f if line.startswith("VmRSS:")), None)
+        except (OSError, IndexError):
+            continue
+        children.setdefault(int(fields[1]), []).append(int(pid))
+        rss_kb[int(pid)] = int(rss_line.split()[1]) if rss_line else 0
+
+    total = 0
+    pending = [root_pid]
+    while pending:
+        pid = pending.pop()
+        total += rss_kb.get(pid, 0)
+        pending.extend(children.get(pid, []))
+    return total / 1024
+
+def measure_profile(profile_name, urls, runs):
+    """Load every URL runs times with the given blocking profile, return load times and peak RSS"""
+    Config.RESOURCE_BLOCKING_PROFILE = profile_name
+    driver = setup_anti_detection_driver()
+    load_times = []
+    peak_rss = 0
+    try:
+        for _ in range(runs):
+            for url in urls:
+                start = time.perf_counter()
+                driver.get(url)
+                wait_for_document_ready(driver, Config.WAIT_BUDGETS["page_load"])
+                load_times.append(time.perf_counter() - start)
+                peak_rss = max(peak_rss, process_tree_rss(driver.service.process.pid))
+                driver.get("about:blank")
+    finally:
+        driver.quit()
+    return load_times, peak_rss
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Compare page loads with resource blocking on and off")
+    parser.add_argument("--url", "-u", action="append",
+                        help="URL to load, can be repeated (default: Google homepage; add a Lens results URL for a full picture)")
+    parser.add_argument("--runs", "-r", type=int, default=5, help="Loads per URL and profile")
+    parser.add_argument("--profiles", "-p", nargs="+", default=["off", Config.RESOURCE_BLOCKING_PROFILE],
+                        help="Blocking profiles to compare")
+    parser.add_argument("--low-memory", action="store_true", help="Also enable the low-memory Chrome flags")
+    args = parser.parse_args()
+
+    urls = args.url or ["https://www.google.com"]
+    Config.LOW_MEMORY_CHROME = args.low_memory
+
+    print(f"{'profile':<12} {'median load (s)':>16} {'p90 load (s)':>13} {'peak RSS (MB)':>14}")
+    for profile_name in dict.fromkeys(args.profiles):
+        load_times, peak_rss = measure_profile(profile_name, urls, args.runs)
+        p90 = statistics.quantiles(load_times, n=10)[-1] if len(load_times) > 1 else load_times[0]
+        print(f"{profile_name:<12} {statistics.median(load_times):>16.3f} {p90:>13.3f} {peak_rss:>14.1f}")
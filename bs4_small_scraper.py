@@ -1,5 +1,6 @@
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import csv
 import logging
 from urllib.parse import urlparse
@@ -7,67 +8,188 @@ import time
 import os
 import argparse
 from config import Config
+from streaming_html import StreamingTextCollector, is_text_content_type
+from text_extractors import get_extractor
+from page_cache import get_page_cache
+from dedup import NearDuplicateIndex
+from domain_health import get_domain_health
+from url_ranking import rank_urls
+import asyncio
 import concurrent.futures
 import re
+import threading
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
-def get_text_from_url(url, timeout=10):
-    """Extract plain text from a URL"""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.5',
-        'Referer': 'https://www.google.com/',
-        'DNT': '1',
-    }
+# urllib3 only decodes brotli when a brotli package is installed
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = 'gzip, deflate, br'
+    except ImportError:
+        ACCEPT_ENCODING = 'gzip, deflate'
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Encoding': ACCEPT_ENCODING,
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Referer': 'https://www.google.com/',
+    'DNT': '1',
+}
+
+# Shared session, so connections to the same hosts are kept alive across URLs and API requests
+_session = None
+_session_lock = threading.Lock()
+
+def get_http_session():
+    """Return the shared requests.Session, creating it on first use"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=Config.HTTP_RETRIES,
+                read=0,  # a read timeout already cost the full timeout, don't pay it twice
+                backoff_factor=Config.HTTP_RETRY_BACKOFF,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=["GET", "HEAD"],
+                respect_retry_after_header=False,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=Config.HTTP_POOL_CONNECTIONS,
+                pool_maxsize=Config.HTTP_POOL_MAXSIZE,
+                max_retries=retry,
+            )
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+def extract_text_from_html(html):
+    """Extract the visible plain text of an HTML document with the configured extractor"""
+    return get_extractor().extract(html)
+
+def get_text_from_url(url, timeout=None, max_chars=None):
+    """Extract plain text from a URL, at least max_chars of it when the page has them"""
+    domain_health = get_domain_health()
+    if timeout is None:
+        timeout = domain_health.timeout_for(url) if domain_health else Config.SCRAPER_TIMEOUT
+    
+    # Fresh cached pages are served without any network call, stale ones are revalidated
+    page_cache = get_page_cache()
+    cached = page_cache.lookup(url, max_chars) if page_cache else None
+    if cached is not None and cached.fresh:
+        page_cache.record("hit")
+        logger.info(f"Page cache hit for {url}")
+        return cached.text
     
+    outcome = "miss"
+    status = error = None
+    chars = 0
+    start = time.perf_counter()
     try:
         logger.info(f"Requesting content from {url}")
-        response = requests.get(url, headers=headers, timeout=timeout)
-        response.raise_for_status()
-        
-        # Parse with BeautifulSoup
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Remove script and style tags
-        for script_or_style in soup(['script', 'style', 'header', 'footer', 'nav']):
-            script_or_style.decompose()
-        
-        # Get text and clean it up
-        text = soup.get_text(separator=' ', strip=True)
-        
-        # Remove extra whitespace and normalize
-        text = ' '.join(text.split())
+        headers = cached.conditional_headers() if cached else None
+        with get_http_session().get(url, timeout=timeout, headers=headers, stream=True) as response:
+            status = response.status_code
+            if cached is not None and response.status_code == 304:
+                outcome = "revalidated"
+                page_cache.revalidated(url, cached, response.headers)
+                logger.info(f"Page cache revalidated {url}")
+                chars = len(cached.text)
+                return cached.text
+            response.raise_for_status()
+            
+            if Config.SCRAPER_STREAMING:
+                text, complete = _read_streaming_text(url, response, max_chars)
+                if text is None:
+                    return None
+            else:
+                text, complete = extract_text_from_html(response.text), True
         
+        if page_cache is not None:
+            page_cache.store(url, text, response.headers, complete, max_chars)
         logger.info(f"Successfully extracted {len(text)} chars from {url}")
+        chars = len(text)
         return text
         
     except requests.exceptions.RequestException as e:
+        error = classify_request_error(e)
         logger.error(f"Error fetching {url}: {e}")
         return None
     except Exception as e:
+        error = "error"
         logger.error(f"Unexpected error processing {url}: {e}")
         return None
+    finally:
+        if page_cache is not None:
+            page_cache.record(outcome)
+        if domain_health is not None:
+            domain_health.record(url, time.perf_counter() - start, status, error, chars, timeout)
 
-def process_url(url_info, source_char_limit):
-    """Process a single URL and return the extracted content"""
-    url, description = url_info
+def classify_request_error(e):
+    """Error kind recorded in the domain health stats"""
+    if isinstance(e, requests.exceptions.Timeout):
+        return "timeout"
+    if isinstance(e, requests.exceptions.RetryError):
+        return "retries"  # still failing with 429/5xx after the retries
+    if isinstance(e, requests.exceptions.ConnectionError):
+        return "connection"
+    if isinstance(e, requests.exceptions.HTTPError):
+        return "http"
+    return "request"
+
+def _read_streaming_text(url, response, max_chars):
+    """Parse the body chunk by chunk, stopping at max_chars of text or MAX_BYTES_PER_URL
     
-    # Format the source info
+    Returns (text, complete), complete being False when the text stopped at max_chars,
+    or (None, False) for content types we don't extract text from.
+    """
+    # Reject PDFs, images, videos... before downloading them
+    content_type = response.headers.get('Content-Type')
+    if not is_text_content_type(content_type):
+        logger.info(f"Skipping {url}: unsupported content type {content_type}")
+        return None, False
+    
+    collector = StreamingTextCollector(content_type, max_chars, Config.MAX_BYTES_PER_URL)
+    for chunk in response.iter_content(chunk_size=Config.SCRAPER_CHUNK_SIZE):
+        if collector.feed(chunk):
+            break
+    text = collector.get_text()
+    collector.log_stats(url)
+    return text, collector.complete
+
+def describe_source(url, description):
+    """Return the netloc of a URL and the 'Source: ...' line that introduces its content"""
     netloc = urlparse(url).netloc
     source_info = f"Source: {netloc}"
     if description:
         source_info += f" - {description}"
+    return netloc, source_info
+
+def is_google_domain(netloc):
+    return re.match(r'(www\.)?google\.[a-z]+', netloc) is not None
+
+def process_url(url_info, source_char_limit):
+    """Process a single URL and return the extracted content"""
+    url, description = url_info
+    
+    # Format the source info
+    netloc, source_info = describe_source(url, description)
     
     # Skip Google domains
-    if re.match(r'(www\.)?google\.[a-z]+', netloc):
+    if is_google_domain(netloc):
         logger.info(f"Skipping Google domain: {netloc}")
         return None
     
     # Extract content
-    content = get_text_from_url(url)
+    content = get_text_from_url(url, max_chars=source_char_limit)
     if content is None:
         # Skip URLs with errors
         return None
@@ -76,86 +198,344 @@ def process_url(url_info, source_char_limit):
     excerpt = content[:source_char_limit]
     return (source_info, excerpt)
 
-def scrape_first_urls(csv_path, output_txt_path, max_urls=None, char_limit=None):
-    """Scrape content from the first URLs in the CSV file"""
-    # Use configuration values if not specified
-    if max_urls is None:
-        max_urls = Config.MAX_URLS_TO_SCRAPE
-    if char_limit is None:
-        char_limit = Config.MAX_CHARACTERS_IN_SUMMARY
+def read_urls_to_process(csv_path, max_urls, links=None, report=None, spares=0, target_chars=None):
+    """Return max_urls (url, description) pairs to fetch, then up to spares more, from the Lens links or the CSV file"""
+    candidates = []
     
-    # Calculate per-source character limit (1/4 of total, but at least 200 chars)
-    source_char_limit = max(200, char_limit // 4)
-    logger.info(f"Per-source character limit: {source_char_limit}")
+    if links is not None:
+        # Links are already deduplicated and in page order
+        candidates = [(link['url'], link.get('description', "")) for link in links]
+    else:
+        # Read URLs from CSV
+        try:
+            with open(csv_path, 'r', encoding='utf-8') as csv_file:
+                reader = csv.reader(csv_file)
+                next(reader)  # Skip header
+                for row in reader:
+                    if row and row[0]:
+                        candidates.append((row[0], row[1] if len(row) > 1 else ""))
+        except Exception as e:
+            logger.error(f"Error reading CSV file {csv_path}: {e}")
+            candidates = []
+    return select_urls(candidates, max_urls, report, spares, target_chars)
+
+def select_urls(candidates, max_urls, report=None, spares=0, target_chars=None):
+    """Choose the URLs worth a fetch slot among the candidates
     
-    urls_to_process = []
+    Domains whose circuit is open are skipped, so other URLs take their slots. With URL_RANKING_ENABLED
+    the rest are ranked (see url_ranking.py), otherwise they are taken in page order.
+    """
+    domain_health = get_domain_health()
+    eligible = []
+    for url, description in candidates:
+        if domain_health is not None and domain_health.is_open(url):
+            logger.info(f"Skipping {url}: its domain keeps failing")
+            if report is not None:
+                report.set(url, "skipped")
+            continue
+        eligible.append((url, description))
     
-    # Read URLs from CSV
-    try:
-        with open(csv_path, 'r', encoding='utf-8') as csv_file:
-            reader = csv.reader(csv_file)
-            next(reader)  # Skip header
-            for i, row in enumerate(reader):
-                if i >= max_urls:
-                    break
-                if row and row[0]:
-                    urls_to_process.append((row[0], row[1] if len(row) > 1 else ""))
-    except Exception as e:
-        logger.error(f"Error reading CSV file {csv_path}: {e}")
-        urls_to_process = []
+    if not Config.URL_RANKING_ENABLED:
+        return eligible[:max_urls + spares]
     
-    if not urls_to_process:
-        logger.warning("No URLs to process!")
-        return ""
+    # Google pages are never scraped, don't let them take a slot
+    eligible = [(url, description) for url, description in eligible if not is_google_domain(urlparse(url).netloc)]
+    return rank_urls(eligible, max_urls, spares, target_chars or Config.MAX_CHARACTERS_IN_SUMMARY // Config.SOURCE_TARGET_COUNT)
+
+class ScrapeReport:
+    """What happened to each URL considered by a scrape: completed, failed, timed_out, cancelled or skipped
+
+    timed_out fetches were still running at the deadline, cancelled ones were no longer
+    needed (the text budget was full before they finished)
+    """
     
-    # Process URLs in parallel but maintain order
-    all_text = []
-    current_length = 0
+    def __init__(self):
+        self.statuses = {}
+        self.deadline_hit = False
+        self.elapsed = None
+        self.sources = 0  # sources in the assembled text
+        self.duplicates = 0  # near-duplicate sources left out
+        self.chars_saved = 0  # budget those duplicates would have taken
     
-    # Use ThreadPoolExecutor for concurrent processing
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        # Submit all tasks but keep track of their order
-        future_to_url = {
-            executor.submit(process_url, url_info, source_char_limit): i 
-            for i, url_info in enumerate(urls_to_process)
-        }
+    def set(self, url, status):
+        self.statuses[url] = status
+    
+    def to_dict(self):
+        report = {status: [] for status in ("completed", "failed", "timed_out", "cancelled", "skipped")}
+        for url, status in self.statuses.items():
+            report[status].append(url)
+        report["sources"] = self.sources
+        report["duplicates"] = self.duplicates
+        report["chars_saved"] = self.chars_saved
+        report["deadline_hit"] = self.deadline_hit
+        report["elapsed"] = round(self.elapsed, 2) if self.elapsed is not None else None
+        return report
+
+class OrderedAssembler:
+    """Builds the scraped text in input order while results arrive in any order
+    
+    A result is appended as soon as every earlier one has settled, so the assembler
+    knows the character budget is full without waiting for the remaining fetches.
+    The budget is planned for SOURCE_TARGET_COUNT sources, and shared by the sources
+    actually kept once the scrape is over.
+    """
+    
+    def __init__(self, total, char_limit):
+        self.total = total
+        self.char_limit = char_limit
+        self.fair_share = max(1, char_limit // Config.SOURCE_TARGET_COUNT)
+        self.sources = []  # [source_info, content] of the kept sources, in order
+        self.current_length = 0  # planned length, with each content counted up to fair_share
+        self._settled = {}
+        self._next = 0
+        # Near-duplicate sources (mirrors, syndicated copies) don't get budget of their own
+        self._dedup = NearDuplicateIndex() if Config.DEDUP_ENABLED else None
+        self._source_lines = {}  # source index -> (position in sources, source_info, copies' hosts)
+        self.duplicates = 0
+        self.chars_saved = 0
+    
+    @property
+    def full(self):
+        return self.current_length >= self.char_limit
+    
+    @property
+    def done(self):
+        """True once no outstanding result can change the output"""
+        return self.full or self._next >= self.total
+    
+    def add(self, idx, result):
+        """Record the result of the URL at index idx (None for errors), then emit what is now in order"""
+        self._settled[idx] = result
+        while self._next in self._settled and not self.full:
+            self._append(self._next, self._settled.pop(self._next))
+            self._next += 1
+    
+    def _append(self, idx, result):
+        if not result:  # Skip None results (errors or Google domains)
+            return
+        source_info, content = result
         
-        # Process results in order of submission
-        results = [None] * len(urls_to_process)
+        if self._dedup is not None:
+            original, similarity = self._dedup.match_or_add(idx, content)
+            if original is not None:
+                self._collapse(original, source_info, content, similarity)
+                return
         
-        # As each future completes (in any order)
-        for future in concurrent.futures.as_completed(future_to_url):
-            idx = future_to_url[future]
-            try:
-                result = future.result()
-                if result:  # Skip None results (errors or Google domains)
-                    results[idx] = result
-            except Exception as e:
-                logger.error(f"Error processing URL at index {idx}: {e}")
+        # Add source info and content, content is cut to its share in result()
+        self._source_lines[idx] = (len(self.sources), source_info, [])
+        self.sources.append([source_info, content])
+        self.current_length += len(source_info) + 1  # +1 for newline
+        self.current_length += min(len(content), self.fair_share) + 1  # +1 for newline
         
-        # Compile final text in correct order
-        for result in results:
-            if result and current_length < char_limit:
-                source_info, content = result
-                
-                # Add source info
-                all_text.append(source_info)
-                current_length += len(source_info) + 1  # +1 for newline
-                
-                # Add content
-                content_to_add = content[:char_limit - current_length]
-                if content_to_add:
-                    all_text.append(content_to_add)
-                    current_length += len(content_to_add) + 1  # +1 for newline
-                
-                if current_length >= char_limit:
-                    logger.info(f"Reached character limit of {char_limit}. Stopping.")
-                    break
-    
-    # Combine all text and ensure we're within char_limit
-    combined_text = "\n".join(all_text)
-    limited_text = combined_text[:char_limit]
+        if self.full:
+            logger.info(f"Reached character limit of {self.char_limit}. Stopping.")
     
+    def _collapse(self, original, source_info, content, similarity):
+        """Leave a duplicate source out, in collapse mode its host is named on the original's source line"""
+        # What the duplicate would have taken from the budget
+        would_add = min(len(source_info) + min(len(content), self.fair_share) + 2, self.char_limit - self.current_length)
+        added = 0
+        if Config.DEDUP_MODE == "collapse":
+            position, original_info, copies = self._source_lines[original]
+            # "Source: host - description" -> host
+            copies.append(source_info[len("Source: "):].split(" - ", 1)[0])
+            line = f"{original_info} (also on: {', '.join(copies)})"
+            added = len(line) - len(self.sources[position][0])
+            self.sources[position][0] = line
+            self.current_length += added
+        self.duplicates += 1
+        self.chars_saved += would_add - added
+        logger.info(f"Skipping near-duplicate source ({similarity:.0%} similar to an earlier one): {source_info}")
+    
+    @property
+    def pending(self):
+        """Number of URLs whose result will not be used"""
+        return self.total - self._next
+    
+    def finish(self):
+        """Give up on the results still missing (deadline), and emit the settled ones after them in order"""
+        for idx in range(self._next, self.total):
+            if self.full:
+                break
+            if idx in self._settled:
+                self._append(idx, self._settled.pop(idx))
+        self._next = self.total
+    
+    def _content_limits(self):
+        """Characters of each source's content: an equal share of the budget left by the source lines,
+        what shorter contents don't use goes to the longer ones"""
+        available = self.char_limit - sum(len(source_info) + 2 for source_info, _ in self.sources)
+        limits = [0] * len(self.sources)
+        by_length = sorted(range(len(self.sources)), key=lambda i: len(self.sources[i][1]))
+        for remaining, i in zip(range(len(by_length), 0, -1), by_length):
+            limits[i] = max(0, min(len(self.sources[i][1]), available // remaining))
+            available -= limits[i]
+        return limits
+    
+    def result(self):
+        """Return (text, number of sources used), the text being within char_limit"""
+        all_text = []
+        for (source_info, content), limit in zip(self.sources, self._content_limits()):
+            all_text.append(source_info)
+            if content[:limit]:
+                all_text.append(content[:limit])
+        combined_text = "\n".join(all_text)
+        source_count = len(self.sources)
+        if self.duplicates:
+            logger.info(f"Left out {self.duplicates} near-duplicate sources, saving {self.chars_saved} characters")
+        return combined_text[:self.char_limit], source_count
+
+class ScrapeScheduler:
+    """Decides which URLs are fetched and when, within the stage deadline
+    
+    The first primary_count URLs start right away. The next ones are spares: one starts
+    whenever a fetch fails or has been running for SCRAPE_HEDGE_AFTER seconds, so the budget
+    can still fill before the deadline. Results go to an OrderedAssembler in URL order.
+    """
+    
+    def __init__(self, urls, primary_count, char_limit, deadline=None, report=None):
+        self.urls = urls
+        self.primary_count = min(primary_count, len(urls))
+        self.assembler = OrderedAssembler(0, char_limit)  # total grows as URLs start
+        self.report = report if report is not None else ScrapeReport()
+        self.start_time = time.monotonic()
+        self.deadline_at = self.start_time + deadline if deadline else None
+        self.started = {}  # index -> monotonic time its fetch started
+        self._next = 0
+        self._hedged = set()
+    
+    @property
+    def done(self):
+        return self.assembler.done
+    
+    @property
+    def expired(self):
+        return self.deadline_at is not None and time.monotonic() >= self.deadline_at
+    
+    def _launch(self):
+        """Return the next URL to fetch as (index, (url, description))"""
+        idx = self._next
+        self._next += 1
+        self.assembler.total += 1
+        return idx, self.urls[idx]
+    
+    def _launch_spare(self, reason):
+        if self._next >= len(self.urls):
+            return []
+        idx, url_info = self._launch()
+        logger.info(f"Starting spare URL {url_info[0]} ({reason})")
+        return [(idx, url_info)]
+    
+    def initial(self):
+        """URLs to start right away"""
+        return [self._launch() for _ in range(self.primary_count)]
+    
+    def mark_started(self, idx):
+        """Called by the fetch itself, queued fetches aren't slow yet"""
+        self.started[idx] = time.monotonic()
+    
+    def on_result(self, idx, result):
+        """Record a finished fetch, return the URLs to start in its place"""
+        url = self.urls[idx][0]
+        if result is not None:
+            self.report.set(url, "completed")
+        elif is_google_domain(urlparse(url).netloc):
+            self.report.set(url, "skipped")
+        else:
+            self.report.set(url, "failed")
+        self.assembler.add(idx, result)
+        if result is None and not self.assembler.full:
+            return self._launch_spare("an earlier URL failed")
+        return []
+    
+    def hedges(self, running):
+        """Start a spare for each running fetch that just became slow"""
+        now = time.monotonic()
+        starts = []
+        for idx in running:
+            if idx in self._hedged or idx not in self.started:
+                continue
+            if now - self.started[idx] >= Config.SCRAPE_HEDGE_AFTER:
+                self._hedged.add(idx)
+                starts += self._launch_spare(f"{self.urls[idx][0]} is slow")
+        return starts
+    
+    def wait_timeout(self, running):
+        """Seconds until the deadline or the next fetch turns slow, None to wait for results only"""
+        now = time.monotonic()
+        timeouts = []
+        if self.deadline_at is not None:
+            timeouts.append(self.deadline_at - now)
+        if self._next < len(self.urls):
+            for idx in running:
+                if idx in self._hedged:
+                    continue
+                if idx in self.started:
+                    timeouts.append(self.started[idx] + Config.SCRAPE_HEDGE_AFTER - now)
+                else:
+                    # Queued fetch, check again once it may have started
+                    timeouts.append(Config.SCRAPE_HEDGE_AFTER)
+        return max(0, min(timeouts)) if timeouts else None
+    
+    def finish(self, running):
+        """Close the stage: fetches still running timed out (deadline) or were cancelled (budget full),
+        URLs never started were skipped"""
+        expired = self.expired
+        for idx in running:
+            url = self.urls[idx][0]
+            if idx not in self.started:
+                self.report.set(url, "skipped")
+            elif expired:
+                self.report.set(url, "timed_out")
+                self.report.deadline_hit = True
+            else:
+                self.report.set(url, "cancelled")
+        if running and expired:
+            logger.warning(f"Scrape deadline reached, {len(running)} fetches left behind")
+        self.assembler.finish()
+        self.report.elapsed = time.monotonic() - self.start_time
+
+def fetch_with_threads(scheduler, source_char_limit):
+    """Thread backend: process URLs in parallel as the scheduler starts them, until it is done or expired"""
+    # Use ThreadPoolExecutor for concurrent processing
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=Config.SCRAPER_MAX_WORKERS)
+    future_to_url = {}
+    
+    def run(idx, url_info):
+        scheduler.mark_started(idx)
+        return process_url(url_info, source_char_limit)
+    
+    def submit(starts):
+        for idx, url_info in starts:
+            future_to_url[executor.submit(run, idx, url_info)] = idx
+    
+    try:
+        submit(scheduler.initial())
+        while future_to_url and not scheduler.done and not scheduler.expired:
+            # Wake up on results, on the deadline and when a fetch may have become slow
+            finished, _ = concurrent.futures.wait(
+                future_to_url, timeout=scheduler.wait_timeout(future_to_url.values()),
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+            for future in finished:
+                idx = future_to_url.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Error processing URL at index {idx}: {e}")
+                    result = None
+                submit(scheduler.on_result(idx, result))
+            if not scheduler.done and not scheduler.expired:
+                submit(scheduler.hedges(future_to_url.values()))
+    finally:
+        scheduler.finish(list(future_to_url.values()))
+        # Don't wait for fetches whose result can't be used anymore
+        if future_to_url:
+            logger.info(f"Cancelling {len(future_to_url)} outstanding fetches")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def save_content(limited_text, output_txt_path, source_count, char_limit):
+    """Write the scraped content to the output text file"""
     # Create directory if it doesn't exist
     os.makedirs(os.path.dirname(output_txt_path) if os.path.dirname(output_txt_path) else ".", exist_ok=True)
     
@@ -164,12 +544,90 @@ def scrape_first_urls(csv_path, output_txt_path, max_urls=None, char_limit=None)
         out_file.write(limited_text)
     
     # Log the results
-    source_count = len([t for t in all_text if t.startswith("Source:")])
     logger.info(f"Scraped content from {source_count} valid sources and saved to {output_txt_path}")
     logger.info(f"Content length: {len(limited_text)} chars (limited to {char_limit})")
+
+def _scrape_settings(max_urls, char_limit, backend, deadline):
+    """Fill in the configuration defaults of a scrape"""
+    # Use configuration values if not specified
+    if max_urls is None:
+        max_urls = Config.MAX_URLS_TO_SCRAPE
+    if char_limit is None:
+        char_limit = Config.MAX_CHARACTERS_IN_SUMMARY
+    if backend is None:
+        backend = Config.SCRAPER_BACKEND
+    if backend not in ("thread", "async"):
+        raise ValueError(f"Unknown scraper backend '{backend}', expected 'thread' or 'async'")
+    if deadline is None:
+        deadline = Config.SCRAPE_DEADLINE_SECONDS
     
+    # Download cap per source: SOURCE_MAX_SHARE of the total (at least 200 chars), as much as
+    # one source can get when few succeed
+    source_char_limit = max(200, int(char_limit * Config.SOURCE_MAX_SHARE))
+    logger.info(f"Per-source character limit: {source_char_limit}")
+    return max_urls, char_limit, source_char_limit, backend, deadline
+
+def _create_scheduler(csv_path, max_urls, char_limit, source_char_limit, deadline, links, report):
+    """Scheduler over the URLs to scrape (with spares), or None when there are none"""
+    urls_to_process = read_urls_to_process(csv_path, max_urls, links, report, spares=Config.SCRAPE_SPARE_URLS,
+                                           target_chars=max(200, char_limit // Config.SOURCE_TARGET_COUNT))
+    if not urls_to_process:
+        logger.warning("No URLs to process!")
+        return None
+    return ScrapeScheduler(urls_to_process, max_urls, char_limit, deadline, report)
+
+def _finish_scrape(scheduler, output_txt_path, char_limit):
+    limited_text, source_count = scheduler.assembler.result()
+    scheduler.report.sources = source_count
+    scheduler.report.duplicates = scheduler.assembler.duplicates
+    scheduler.report.chars_saved = scheduler.assembler.chars_saved
+    save_content(limited_text, output_txt_path, source_count, char_limit)
     return limited_text
 
+def scrape_first_urls(csv_path, output_txt_path, max_urls=None, char_limit=None, links=None, backend=None,
+                      deadline=None, report=None):
+    """Scrape content from the first URLs in the CSV file
+    
+    The links returned by the Lens search can be given directly instead of a CSV path.
+    backend is "thread" or "async" (default: Config.SCRAPER_BACKEND), results are in CSV order with both.
+    The stage stops after deadline seconds (default: Config.SCRAPE_DEADLINE_SECONDS) with the content
+    it has; pass a ScrapeReport to learn which URLs completed, failed, timed out or were skipped.
+    """
+    max_urls, char_limit, source_char_limit, backend, deadline = _scrape_settings(max_urls, char_limit, backend, deadline)
+    
+    scheduler = _create_scheduler(csv_path, max_urls, char_limit, source_char_limit, deadline, links, report)
+    if scheduler is None:
+        return ""
+    
+    # Process URLs in parallel but maintain order
+    if backend == "async":
+        from async_scraper import fetch_all, run_in_background_loop
+        run_in_background_loop(fetch_all(scheduler, source_char_limit))
+    else:
+        fetch_with_threads(scheduler, source_char_limit)
+    
+    return _finish_scrape(scheduler, output_txt_path, char_limit)
+
+async def scrape_first_urls_async(csv_path, output_txt_path, max_urls=None, char_limit=None, links=None, backend=None,
+                                  deadline=None, report=None):
+    """Same as scrape_first_urls, awaited from a running event loop such as the FastAPI app's
+    
+    The async backend runs on the caller's loop, the thread backend in a worker thread
+    """
+    max_urls, char_limit, source_char_limit, backend, deadline = _scrape_settings(max_urls, char_limit, backend, deadline)
+    
+    scheduler = _create_scheduler(csv_path, max_urls, char_limit, source_char_limit, deadline, links, report)
+    if scheduler is None:
+        return ""
+    
+    if backend == "async":
+        from async_scraper import fetch_all
+        await fetch_all(scheduler, source_char_limit)
+    else:
+        await asyncio.to_thread(fetch_with_threads, scheduler, source_char_limit)
+    
+    return _finish_scrape(scheduler, output_txt_path, char_limit)
+
 # Module can be run independently
 if __name__ == "__main__":
     # Setup basic logging for standalone use
@@ -182,6 +640,8 @@ if __name__ == "__main__":
     parser.add_argument("--output", "-o", help="Output text file path")
     parser.add_argument("--max-urls", "-m", type=int, help=f"Maximum URLs to scrape (default: {Config.MAX_URLS_TO_SCRAPE})")
     parser.add_argument("--char-limit", "-l", type=int, help=f"Character limit for output (default: {Config.MAX_CHARACTERS_IN_SUMMARY})")
+    parser.add_argument("--backend", "-b", choices=["thread", "async"], help=f"Fetch backend (default: {Config.SCRAPER_BACKEND})")
+    parser.add_argument("--deadline", "-d", type=float, help=f"Seconds the whole scrape may take (default: {Config.SCRAPE_DEADLINE_SECONDS})")
     
     # Parse arguments
     args = parser.parse_args()
@@ -195,6 +655,9 @@ if __name__ == "__main__":
     
     # Run scraper
     logger.info(f"Scraping content from URLs in {args.csv}")
-    content = scrape_first_urls(args.csv, args.output, args.max_urls, args.char_limit)
+    report = ScrapeReport()
+    content = scrape_first_urls(args.csv, args.output, args.max_urls, args.char_limit, backend=args.backend,
+                                deadline=args.deadline, report=report)
     
-    logger.info(f"Scraping complete. Content saved to {args.output}")
\ No newline at end of file
+    logger.info(f"Scraping complete. Content saved to {args.output}")
+    logger.info(f"Scrape report: {report.to_dict()}")
\ No newline at end of file
@@ -7,28 +7,201 @@ class Config:
     # Selenium settings
     HEADLESS_MODE = True
     
+    # Driver pool settings (number of warm Chrome instances kept between searches, 0 disables the pool)
+    DRIVER_POOL_SIZE = 2
+    DRIVER_POOL_ACQUIRE_TIMEOUT = 120  # seconds a request waits for a free driver
+    # Number of concurrent Lens searches run in tabs of the same Chrome, 1 gives each search its own browser
+    # (with more than 1 tab, DRIVER_POOL_SIZE is the number of browsers)
+    TABS_PER_BROWSER = 1
+    
+    # Persistent Chrome profile per pool slot, so consent cookies and cached static assets survive between searches
+    PERSISTENT_CHROME_PROFILE = True
+    PROFILE_DISK_CACHE_MB = 100  # upper bound of Chrome's disk cache in each profile
+    PROFILE_RESET_EVERY = 500  # searches after which a slot's profile is wiped, 0 to never reset
+    PROFILE_MAX_SIZE_MB = 500  # profiles bigger than this are wiped when their browser is launched
+    
+    # Resource blocking: "off", "standard" (fonts, media, trackers) or "aggressive" (also images)
+    RESOURCE_BLOCKING_PROFILE = "standard"
+    RESOURCE_BLOCKING_EXTRA_PATTERNS = []  # more CDP URL patterns to block, e.g. "*://*.example.com/*"
+    RESOURCE_BLOCKING_ALLOWLIST = ["lens.google.com"]  # host patterns targeting these are dropped, extension patterns still apply
+    LOW_MEMORY_CHROME = False  # extra Chrome flags for a smaller memory footprint
+    
+    # Wait budgets (upper bounds in seconds) for each stage of the Lens flow,
+    # every wait returns as soon as its condition is met
+    WAIT_BUDGETS = {
+        "default": 5,
+        "cookie_consent": 3,
+        "page_load": 10,
+        "dom_quiet": 2,
+        "lens_button": 5,
+        "import_option": 5,
+        "file_input": 3,
+        "results": 20,
+    }
+    WAIT_POLL_INTERVAL = 0.1  # seconds between two checks of a wait condition
+    DOM_QUIET_PERIOD = 0.5  # seconds without DOM mutation before the page is considered settled
+    RESULTS_STABLE_PERIOD = 1.0  # seconds the number of result links must stay the same
+    
+    # Lens fast path: open the upload dialog directly instead of clicking through google.com,
+    # falls back to the Lens button route if it fails
+    LENS_FAST_PATH = True
+    LENS_DIRECT_URL = "https://www.google.com/?olud"
+    
+    # Tracing settings: time budget in seconds for each step of the Lens flow,
+    # the page HTML is saved to TRACE_DIR when a step fails or goes over its budget
+    TRACE_STEP_BUDGETS = {
+        "direct_navigate": 5,
+        "direct_upload": 6,
+        "navigate": 5,
+        "cookie_consent": 3,
+        "lens_button": 8,
+        "import_option": 8,
+        "upload_image": 5,
+        "results": 20,
+        "extract_links": 2,
+    }
+    SAVE_SLOW_STEP_HTML = True
+    TRACE_HISTOGRAM_BUCKETS = [0.25, 0.5, 1, 2, 5, 10, 20, 40]  # seconds
+    
     # Image settings (this is only when usung the fastapi backend)
-    IMAGE_FILE_EXTENSION = "png"
+    IMAGE_FILE_EXTENSION = "png"  # fallback when the uploaded image format can't be detected
+    
+    # Image pre-processing before the Lens upload (downscale, strip EXIF, re-encode)
+    PREPROCESS_IMAGES = True
+    PREPROCESS_MAX_EDGE = 1600  # pixels, longest side of the uploaded image
+    PREPROCESS_FORMAT = "JPEG"  # "JPEG" or "WEBP"
+    PREPROCESS_QUALITY = 85
     
     # Scraper settings
     MAX_URLS_TO_SCRAPE = 10
     MAX_CHARACTERS_IN_SUMMARY = 2000
+    # The text budget is shared equally by the sources that succeeded, what short ones leave goes to the others
+    SOURCE_TARGET_COUNT = 4  # sources the budget is planned for, the scrape stops once that many fill it
+    SOURCE_MAX_SHARE = 0.5  # most of the budget a single source gets when few succeed (also its download cap)
+    
+    # HTTP session of the scraper (shared by all workers and kept alive across requests)
+    HTTP_POOL_CONNECTIONS = 20  # number of hosts with pooled connections
+    HTTP_POOL_MAXSIZE = 10  # connections kept per host
+    HTTP_RETRIES = 2  # retries on connection errors and 429/5xx responses
+    HTTP_RETRY_BACKOFF = 0.3  # seconds, doubled on each retry
+    
+    # Scraper backend: "thread" (ThreadPoolExecutor) or "async" (asyncio + httpx)
+    SCRAPER_BACKEND = "async"
+    SCRAPER_TIMEOUT = 10  # seconds per URL
+    SCRAPER_MAX_WORKERS = 5  # threads of the thread backend
+    SCRAPER_MAX_CONCURRENCY = 10  # requests in flight with the async backend
+    SCRAPER_PER_HOST_LIMIT = 2  # requests in flight to the same host with the async backend
+    SCRAPER_HTTP2 = False  # needs the h2 package (pip install httpx[http2])
+    SCRAPER_STREAMING = True  # stream pages and stop reading once enough text was parsed
+    MAX_BYTES_PER_URL = 2 * 1024 * 1024  # bytes downloaded per page at most in streaming mode
+    SCRAPER_CHUNK_SIZE = 16 * 1024  # bytes parsed at a time in streaming mode
+    TEXT_EXTRACTOR = "lxml"  # "lxml" (fastest, falls back to "stream" without lxml), "stream" (pure Python) or "bs4"
+    SCRAPE_DEADLINE_SECONDS = 15  # the whole scrape stage returns what it has after this, None for no deadline
+    SCRAPE_SPARE_URLS = 3  # URLs after the first MAX_URLS_TO_SCRAPE, started when a fetch fails or is slow
+    SCRAPE_HEDGE_AFTER = 3  # seconds after which a running fetch is slow and a spare URL starts
+    
+    # URL ranking: which Lens links get a fetch slot (position, description, domain diversity and history)
+    URL_RANKING_ENABLED = True  # False to take the links in page order
+    URL_RANK_POSITION_DECAY = 10  # the link at this position scores half the first one
+    URL_RANK_DOMAIN_REPEAT_PENALTY = 0.5  # score multiplier for each URL already picked from the same domain
+    URL_RANK_MIN_HISTORY = 3  # requests to a domain before its success rate and yield count
+    LOW_YIELD_DOMAINS = [
+        "facebook.com", "instagram.com", "tiktok.com", "twitter.com", "x.com",
+        "pinterest.com", "linkedin.com", "youtube.com", "threads.net",
+    ]
+    
+    # Page cache (text extracted from scraped pages, in a SQLite file shared by worker processes)
+    PAGE_CACHE_ENABLED = True
+    PAGE_CACHE_TTL = 24 * 3600  # seconds a page is served without asking its server, then revalidated
+    PAGE_CACHE_MAX_MB = 200  # least recently used pages are evicted above this size
+    
+    # Near-duplicate sources (mirrors, syndicated copies), detected with MinHash over word shingles
+    DEDUP_ENABLED = True
+    DEDUP_MODE = "collapse"  # "collapse" (name the copies on the first source's line) or "drop"
+    DEDUP_THRESHOLD = 0.6  # estimated Jaccard similarity from which a source is a duplicate
+    DEDUP_SHINGLE_SIZE = 3  # words per shingle
+    DEDUP_NUM_PERM = 64  # MinHash permutations, more is more accurate and slower
+    
+    # Per-domain health (latency, errors), drives adaptive timeouts and the circuit breaker
+    DOMAIN_HEALTH_ENABLED = True
+    DOMAIN_HEALTH_FILE = "domain_health.json"  # in CACHE_DIR, saved every DOMAIN_HEALTH_SAVE_EVERY fetches and at exit
+    DOMAIN_HEALTH_SAVE_EVERY = 20
+    DOMAIN_LATENCY_WINDOW = 50  # latencies kept per domain for the percentiles
+    DOMAIN_TIMEOUT_MIN_SAMPLES = 5  # below this, domains get SCRAPER_TIMEOUT
+    DOMAIN_TIMEOUT_MARGIN = 1.0  # seconds added to the domain's p95 latency
+    DOMAIN_TIMEOUT_MIN = 2  # seconds, adaptive timeouts never go below (nor above SCRAPER_TIMEOUT)
+    DOMAIN_BREAKER_FAILURES = 3  # failures in a row (timeouts, connection errors, 403/429/5xx) that open the circuit
+    DOMAIN_BREAKER_COOLDOWN = 15 * 60  # seconds a domain is skipped once its circuit is open
+    
+    # Lens result cache settings (images are matched by perceptual hash)
+    LENS_CACHE_ENABLED = True
+    LENS_CACHE_MAX_ENTRIES = 200000
+    LENS_CACHE_TTL = 7 * 24 * 3600  # seconds, None to keep entries until evicted
+    LENS_CACHE_MAX_DISTANCE = 4  # max Hamming distance between two hashes of the "same" image
+    LENS_CACHE_STORE_ANALYSIS = True  # also cache the final LLM analysis
+    IMAGE_HASH_SIZE = 8  # dHash of IMAGE_HASH_SIZE^2 bits
     
     # Directories
     IMAGE_DIR = "images"
     CSV_DIR = "csv"
     TXT_DIR = "txt"
+    TRACE_DIR = "traces"
+    CHROME_PROFILE_DIR = "chrome_profiles"
+    CACHE_DIR = "cache"
     
     #What to remove at the end of pipeline
     REMOVE_IMAGES = True
     REMOVE_CSVS = True 
     REMOVE_TXT = False
     
+    # Also write the Lens links to a CSV in the API (they are passed to the scraper in memory)
+    WRITE_LENS_CSV = False
+    
     # LLM Client settings
     # by default, OpenRouter API is used
     BASE_URL = "https://openrouter.ai/api/v1"
     MODEL = "meta-llama/llama-4-scout:free"
     
+    # LLM HTTP clients (one per provider and API key, kept alive across analyses)
+    LLM_MAX_CONNECTIONS = 20
+    LLM_MAX_KEEPALIVE_CONNECTIONS = 10
+    LLM_KEEPALIVE_EXPIRY = 60  # seconds an idle connection is kept
+    LLM_TIMEOUT = 120  # seconds, completions of free models can be slow
+    LLM_CONNECT_TIMEOUT = 10  # seconds
+    LLM_MAX_RETRIES = 2  # retries on connection errors, 408/409/429 and 5xx (with backoff)
+    
+    # Model routing: with candidates, each analysis goes to the fastest healthy one instead of MODEL
+    # Entries are model IDs served at BASE_URL, or dicts {"model": ..., "base_url": ..., "api_key": ...}
+    MODEL_CANDIDATES = []
+    MODEL_CANDIDATES_FREE_LIST = 0  # also route over the first N OpenRouter free models (largest context first)
+    MODEL_ROUTER_WINDOW = 50  # latencies and outcomes kept per model
+    MODEL_ROUTER_MIN_SAMPLES = 3  # requests before a model is ranked by its latency (untried models go first)
+    MODEL_ROUTER_EXPLORE = 0.05  # share of requests sent to another healthy model, to keep its stats current
+    MODEL_ROUTER_ATTEMPTS = 2  # models tried per analysis when the first fails (or is hedged)
+    MODEL_ROUTER_BREAKER_FAILURES = 3  # failures in a row before a model is skipped...
+    MODEL_ROUTER_BREAKER_COOLDOWN = 60  # ...for this many seconds
+    MODEL_HEDGING = False  # start the next model when the first hasn't answered within its p90 latency
+    MODEL_HEDGE_PERCENTILE = 0.9
+    MODEL_HEDGE_MIN_DELAY = 1.0  # seconds, never hedge sooner than this
+
+    # LLM response cache (same model, base URL, prompt, temperature and content -> same analysis)
+    LLM_CACHE_ENABLED = True
+    LLM_CACHE_TTL = 7 * 24 * 3600  # seconds
+    LLM_CACHE_MAX_MB = 50  # least recently used responses are evicted above this size
+    
+    # Context budgeting: the scraped text is sized in tokens from the context window of the models
+    # the analysis may go to (the smallest one with several candidates) instead of MAX_CHARACTERS_IN_SUMMARY
+    CONTEXT_BUDGET_ENABLED = True
+    CONTEXT_TARGET_SHARE = 0.5  # share of the context window the prompt may fill
+    CONTEXT_OUTPUT_RESERVE = 1024  # tokens left for the answer
+    CONTEXT_MAX_TOKENS = 4000  # upper bound of the scraped text, bigger prompts are slower to answer
+    CONTEXT_MIN_TOKENS = 256
+    DEFAULT_CONTEXT_LENGTH = 8192  # tokens, for models missing from the OpenRouter free list
+    MODEL_CONTEXT_LENGTHS = {}  # model ID -> context length in tokens, overrides the free list (e.g. local models)
+    MODEL_CONTEXT_CACHE_TTL = 24 * 3600  # seconds the context lengths fetched from OpenRouter are kept
+    TOKENIZER_ENCODING = "cl100k_base"  # tiktoken encoding, an approximation for non-OpenAI models (set TIKTOKEN_CACHE_DIR to vendor its file)
+    CHARS_PER_TOKEN = 4  # estimate without tiktoken, also turns the token budget into a scrape size
+    
     #LLM parameters
     TEMPERATURE = 0.8
     
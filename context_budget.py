@@ -0,0 +1,115 @@
+import logging
+import threading
+import time
+from config import Config
+from openrouter_free_list import get_free_model_context_lengths
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Seconds before a failed fetch of the context lengths is tried again
+CONTEXT_LENGTHS_RETRY = 300
+
+_encoding = None
+_encoding_failed = False
+_encoding_lock = threading.Lock()
+
+def _get_encoding():
+    """The tiktoken encoding, or None without tiktoken (its BPE file is downloaded on first use)"""
+    global _encoding, _encoding_failed
+    if _encoding_failed:
+        return None
+    with _encoding_lock:
+        if _encoding is None and not _encoding_failed:
+            if tiktoken is None:
+                logger.warning(f"Token counts need the tiktoken package (pip install tiktoken), "
+                               f"estimating {Config.CHARS_PER_TOKEN} characters per token")
+                _encoding_failed = True
+                return None
+            try:
+                _encoding = tiktoken.get_encoding(Config.TOKENIZER_ENCODING)
+            except Exception as e:
+                logger.warning(f"Could not load the {Config.TOKENIZER_ENCODING} tokenizer, "
+                               f"estimating {Config.CHARS_PER_TOKEN} characters per token: {e}")
+                _encoding_failed = True
+        return _encoding
+
+def preload_tokenizer():
+    """Load the tokenizer now, so its BPE file isn't downloaded during the first request
+
+    tiktoken caches the file in TIKTOKEN_CACHE_DIR (default: the system temp dir). Offline hosts
+    can point it at a directory shipped with the file.
+    """
+    _get_encoding()
+
+def count_tokens(text):
+    """Tokens of a text, with tiktoken when installed, else estimated from its length"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return -(-len(text) // Config.CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text, max_tokens):
+    """The start of the text that fits in max_tokens"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * Config.CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+def chars_for_tokens(tokens):
+    """Characters of scraped text expected to make up this many tokens"""
+    return tokens * Config.CHARS_PER_TOKEN
+
+_context_lengths = {}
+_context_lengths_expire = 0
+_context_lengths_lock = threading.Lock()
+
+def _free_model_context_lengths():
+    """Context lengths of the OpenRouter free models, fetched once per MODEL_CONTEXT_CACHE_TTL"""
+    global _context_lengths, _context_lengths_expire
+    with _context_lengths_lock:
+        if time.time() >= _context_lengths_expire:
+            try:
+                context_lengths = get_free_model_context_lengths()
+                # The list comes back empty when OpenRouter answers with an error status
+                if not context_lengths:
+                    raise ValueError("the free model list is empty")
+                _context_lengths = context_lengths
+                _context_lengths_expire = time.time() + Config.MODEL_CONTEXT_CACHE_TTL
+                logger.info(f"Fetched the context length of {len(_context_lengths)} free models")
+            except Exception as e:
+                logger.error(f"Could not fetch the model context lengths: {e}")
+                _context_lengths_expire = time.time() + CONTEXT_LENGTHS_RETRY
+        return _context_lengths
+
+def model_context_length(model):
+    """Context window of a model in tokens: MODEL_CONTEXT_LENGTHS, then the free list, then DEFAULT_CONTEXT_LENGTH"""
+    if model in Config.MODEL_CONTEXT_LENGTHS:
+        return Config.MODEL_CONTEXT_LENGTHS[model]
+    return _free_model_context_lengths().get(model) or Config.DEFAULT_CONTEXT_LENGTH
+
+def content_token_budget(models, system_prompt):
+    """Tokens of content a prompt can carry for every one of the models
+
+    CONTEXT_TARGET_SHARE of the smallest context window, minus the system prompt and
+    CONTEXT_OUTPUT_RESERVE, within [CONTEXT_MIN_TOKENS, CONTEXT_MAX_TOKENS].
+    """
+    context_length = min(model_context_length(model) for model in models)
+    budget = int(context_length * Config.CONTEXT_TARGET_SHARE) - count_tokens(system_prompt) - Config.CONTEXT_OUTPUT_RESERVE
+    return max(Config.CONTEXT_MIN_TOKENS, min(Config.CONTEXT_MAX_TOKENS, budget))
+
+def fit_to_budget(content, max_tokens):
+    """Cut the content to max_tokens, logging when it had to be"""
+    tokens = count_tokens(content)
+    if tokens <= max_tokens:
+        return content
+    logger.info(f"Content of {tokens} tokens cut to the budget of {max_tokens}")
+    return truncate_to_tokens(content, max_tokens)
@@ -0,0 +1,69 @@
+import hashlib
+import logging
+import random
+import re
+from config import Config
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Permutations are (a * x + b) mod a Mersenne prime, truncated to 32 bits
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+def shingles(text, size=None):
+    """Set of the overlapping size-word sequences of a text, case and punctuation insensitive"""
+    if size is None:
+        size = Config.DEDUP_SHINGLE_SIZE
+    words = re.findall(r'\w+', text.lower())
+    if len(words) <= size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+class MinHasher:
+    """MinHash signatures, whose agreement estimates the Jaccard similarity of two shingle sets"""
+
+    def __init__(self, num_perm=None, seed=1):
+        if num_perm is None:
+            num_perm = Config.DEDUP_NUM_PERM
+        # Fixed seed, so signatures are comparable between instances
+        rng = random.Random(seed)
+        self.permutations = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+                             for _ in range(num_perm)]
+
+    def signature(self, shingle_set):
+        hashes = [int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+                  for shingle in shingle_set]
+        if not hashes:
+            return None
+        return [min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes) for a, b in self.permutations]
+
+    @staticmethod
+    def similarity(signature_a, signature_b):
+        """Estimated Jaccard similarity of the two sets"""
+        return sum(x == y for x, y in zip(signature_a, signature_b)) / len(signature_a)
+
+class NearDuplicateIndex:
+    """Signatures of the sources kept so far, to find the earlier one a new text mostly repeats"""
+
+    def __init__(self, threshold=None, shingle_size=None, num_perm=None):
+        self.threshold = threshold if threshold is not None else Config.DEDUP_THRESHOLD
+        self.shingle_size = shingle_size
+        self.hasher = MinHasher(num_perm)
+        # A handful of sources per request, a linear scan beats LSH buckets
+        self._signatures = []
+
+    def match_or_add(self, key, text):
+        """Return (key, similarity) of the earlier text this one duplicates, else remember it and return (None, 0)"""
+        signature = self.hasher.signature(shingles(text, self.shingle_size))
+        if signature is None:
+            return None, 0.0
+        best_key, best_similarity = None, 0.0
+        for other_key, other_signature in self._signatures:
+            similarity = self.hasher.similarity(signature, other_signature)
+            if similarity > best_similarity:
+                best_key, best_similarity = other_key, similarity
+        if best_similarity >= self.threshold:
+            return best_key, best_similarity
+        self._signatures.append((key, signature))
+        return None, best_similarity
@@ -0,0 +1,112 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class DiskCache:
+    """JSON values in a SQLite file, with TTL and size-bounded LRU eviction
+
+    The file is opened in WAL mode with a busy timeout, so several worker processes
+    can share it. Hit/miss counters are stored in the file too, and cover all of them.
+    """
+
+    # Eviction needs a full scan of the sizes, only check every N writes
+    EVICT_EVERY = 50
+
+    def __init__(self, path, max_bytes, ttl=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connection()
+        conn.execute("CREATE TABLE IF NOT EXISTS entries ("
+                     "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                     "stored_at REAL NOT NULL, accessed_at REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+        conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def _connection(self):
+        """SQLite connection of the current thread (and process, connections don't survive a fork)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        """Return the value stored under key, or None if missing or expired"""
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute("SELECT value, stored_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, stored_at = row
+        if self.ttl is not None and now - stored_at > self.ttl:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def set(self, key, value):
+        """Store a JSON-serializable value under key"""
+        data = json.dumps(value)
+        now = time.time()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO entries (key, value, size, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (key, data, len(data), now, now),
+        )
+        self._writes += 1
+        if self._writes % self.EVICT_EVERY == 0:
+            self.evict()
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def evict(self):
+        """Drop expired entries, then the least recently used ones until the file holds at most max_bytes"""
+        conn = self._connection()
+        if self.ttl is not None:
+            conn.execute("DELETE FROM entries WHERE stored_at < ?", (time.time() - self.ttl,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Free a bit more than needed, so we don't evict again on the next check
+        to_free = total - int(self.max_bytes * 0.9)
+        keys = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+            keys.append((key,))
+            to_free -= size
+            if to_free <= 0:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ?", keys)
+        logger.info(f"Evicted {len(keys)} entries from {self.path}")
+
+    def incr(self, name, amount=1):
+        """Add amount to a shared counter"""
+        self._connection().execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+    def stats(self):
+        """Entry count, size and counters of the cache"""
+        conn = self._connection()
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        return {
+            "entries": entries,
+            "size_mb": round(size / (1024 * 1024), 2),
+            "max_size_mb": round(self.max_bytes / (1024 * 1024), 2),
+            "counters": counters,
+        }
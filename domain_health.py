@@ -0,0 +1,202 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from urllib.parse import urlparse
+from config import Config
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Errors that say something about the domain rather than the URL, they trip the circuit breaker
+BREAKER_STATUS_CODES = {403, 429, 500, 502, 503, 504}
+BREAKER_ERRORS = {"timeout", "connection", "retries"}
+
+def domain_of(url):
+    """Host of a URL, without 'www.'"""
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+class DomainStats:
+    """Latencies, errors and status codes of one domain, with its circuit breaker state"""
+
+    def __init__(self, data=None):
+        data = data or {}
+        self.latencies = deque(data.get("latencies", []), maxlen=Config.DOMAIN_LATENCY_WINDOW)
+        self.requests = data.get("requests", 0)
+        self.errors = Counter(data.get("errors", {}))
+        self.status_codes = Counter(data.get("status_codes", {}))
+        self.consecutive_failures = data.get("consecutive_failures", 0)
+        self.open_until = data.get("open_until", 0)
+        self.last_seen = data.get("last_seen", 0)
+        self.chars = data.get("chars", 0)  # characters of text extracted, over all requests
+        self.successes = data.get("successes", 0)  # requests that gave some text
+
+    def to_dict(self):
+        return {
+            "latencies": list(self.latencies),
+            "requests": self.requests,
+            "errors": dict(self.errors),
+            "status_codes": dict(self.status_codes),
+            "consecutive_failures": self.consecutive_failures,
+            "open_until": self.open_until,
+            "last_seen": self.last_seen,
+            "chars": self.chars,
+            "successes": self.successes,
+        }
+
+    def latency_percentile(self, fraction):
+        if not self.latencies:
+            return None
+        return _percentile(sorted(self.latencies), fraction)
+
+class DomainHealth:
+    """Per-domain fetch statistics, driving adaptive timeouts and a circuit breaker
+
+    The statistics are saved to a JSON file (atomically replaced) every few requests and
+    at exit, so they survive restarts. Worker processes each keep their own copy, the
+    last one to save wins.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(Config.CACHE_DIR, Config.DOMAIN_HEALTH_FILE)
+        self._domains = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._unsaved = 0
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._domains = {domain: DomainStats(stats) for domain, stats in data.items()}
+            logger.info(f"Loaded health stats of {len(self._domains)} domains from {self.path}")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Could not load domain health stats from {self.path}: {e}")
+
+    def save(self):
+        """Write the stats to a temporary file, then swap it in so readers never see a partial file"""
+        with self._lock:
+            data = {domain: stats.to_dict() for domain, stats in self._domains.items()}
+            self._unsaved = 0
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with self._save_lock:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Could not save domain health stats to {self.path}: {e}")
+
+    def _stats(self, domain):
+        if domain not in self._domains:
+            self._domains[domain] = DomainStats()
+        return self._domains[domain]
+
+    def record(self, url, latency, status=None, error=None, chars=0, timeout=None):
+        """Record a fetch: its latency in seconds, HTTP status, error kind ('timeout', 'connection'...) and text length
+
+        A timed-out fetch counts as a latency sample at the timeout it was given (the real latency
+        is at least that), so the adaptive timeout of a domain that got slower can grow again.
+        """
+        domain = domain_of(url)
+        with self._lock:
+            stats = self._stats(domain)
+            stats.requests += 1
+            stats.last_seen = time.time()
+            stats.chars += chars
+            if chars:
+                stats.successes += 1
+            if status is not None:
+                stats.status_codes[str(status)] += 1
+            if error is not None:
+                stats.errors[error] += 1
+
+            if error in BREAKER_ERRORS or status in BREAKER_STATUS_CODES:
+                stats.consecutive_failures += 1
+                if stats.consecutive_failures >= Config.DOMAIN_BREAKER_FAILURES:
+                    # Also re-opens right away when the trial request after the cool-down fails
+                    was_open = stats.open_until > time.time()
+                    stats.open_until = time.time() + Config.DOMAIN_BREAKER_COOLDOWN
+                    if not was_open:
+                        logger.warning(f"Circuit open for {domain} after {stats.consecutive_failures} failures in a row, "
+                                       f"skipping it for {Config.DOMAIN_BREAKER_COOLDOWN}s")
+                if error == "timeout":
+                    stats.latencies.append(round(max(latency, timeout or 0), 3))
+            elif error is None and status is not None and status < 400:
+                stats.consecutive_failures = 0
+                stats.latencies.append(round(latency, 3))
+
+            self._unsaved += 1
+            should_save = self._unsaved >= Config.DOMAIN_HEALTH_SAVE_EVERY
+        if should_save:
+            self.save()
+
+    def is_open(self, url):
+        """True while the circuit of the URL's domain is open, its URLs should be skipped"""
+        with self._lock:
+            stats = self._domains.get(domain_of(url))
+            return stats is not None and stats.open_until > time.time()
+
+    def timeout_for(self, url):
+        """The domain's p95 latency plus a margin, within [DOMAIN_TIMEOUT_MIN, SCRAPER_TIMEOUT]"""
+        with self._lock:
+            stats = self._domains.get(domain_of(url))
+            if stats is None or len(stats.latencies) < Config.DOMAIN_TIMEOUT_MIN_SAMPLES:
+                return Config.SCRAPER_TIMEOUT
+            p95 = stats.latency_percentile(0.95)
+        return max(Config.DOMAIN_TIMEOUT_MIN, min(Config.SCRAPER_TIMEOUT, p95 + Config.DOMAIN_TIMEOUT_MARGIN))
+
+    def yield_of(self, url):
+        """(requests, share of requests that gave text, mean characters per request) of the URL's domain, or None"""
+        with self._lock:
+            stats = self._domains.get(domain_of(url))
+            if stats is None or not stats.requests:
+                return None
+            return stats.requests, stats.successes / stats.requests, stats.chars / stats.requests
+
+    def stats(self):
+        """Summary per domain, most requested first"""
+        now = time.time()
+        with self._lock:
+            summary = {}
+            for domain, stats in sorted(self._domains.items(), key=lambda item: -item[1].requests):
+                failures = sum(stats.errors.values())
+                summary[domain] = {
+                    "requests": stats.requests,
+                    "p50_latency": stats.latency_percentile(0.5),
+                    "p95_latency": stats.latency_percentile(0.95),
+                    "error_rate": round(failures / stats.requests, 3) if stats.requests else None,
+                    "success_rate": round(stats.successes / stats.requests, 3) if stats.requests else None,
+                    "chars_per_request": round(stats.chars / stats.requests) if stats.requests else None,
+                    "errors": dict(stats.errors),
+                    "status_codes": dict(stats.status_codes),
+                    "circuit_open_for": round(stats.open_until - now) if stats.open_until > now else 0,
+                }
+        for domain in summary:
+            summary[domain]["timeout"] = self.timeout_for(f"http://{domain}/")
+        return summary
+
+_domain_health = None
+_domain_health_lock = threading.Lock()
+
+def get_domain_health():
+    """Return the domain health tracker of this process, or None when disabled"""
+    global _domain_health
+    if not Config.DOMAIN_HEALTH_ENABLED:
+        return None
+    with _domain_health_lock:
+        if _domain_health is None:
+            _domain_health = DomainHealth()
+            atexit.register(_domain_health.save)
+        return _domain_health
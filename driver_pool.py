@@ -0,0 +1,257 @@
+import logging
+import os
+import queue
+import shutil
+import threading
+from contextlib import contextmanager
+from config import Config
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no profile locking
+    fcntl = None
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Lock files of the profiles this process owns, held until it exits
+_profile_locks = {}
+_profile_locks_lock = threading.Lock()
+
+def profile_dir_for_slot(slot):
+    """Persistent Chrome --user-data-dir of a pool slot, or None if profiles are disabled"""
+    if not Config.PERSISTENT_CHROME_PROFILE:
+        return None
+    return os.path.abspath(os.path.join(Config.CHROME_PROFILE_DIR, f"slot_{slot}"))
+
+def claim_profile_dir(slot):
+    """The slot's persistent profile if this process can own it, else None
+
+    Chrome refuses a --user-data-dir already used by another process (a second worker, the CLI
+    while the API runs), so each profile is guarded by a lock file. Without the lock, the browser
+    gets a temporary profile from Chrome, the next launch tries again.
+    """
+    profile_dir = profile_dir_for_slot(slot)
+    if profile_dir is None or fcntl is None:
+        return profile_dir
+    with _profile_locks_lock:
+        if slot not in _profile_locks:
+            os.makedirs(os.path.dirname(profile_dir), exist_ok=True)
+            lock_file = open(f"{profile_dir}.lock", "w")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                logger.warning(f"Profile {profile_dir} is used by another process, launching with a temporary profile")
+                return None
+            _profile_locks[slot] = lock_file
+    return profile_dir
+
+def owned_profile_dir(slot):
+    """The slot's persistent profile if this process owns it, else None"""
+    profile_dir = profile_dir_for_slot(slot)
+    if profile_dir is None or fcntl is None:
+        return profile_dir
+    with _profile_locks_lock:
+        return profile_dir if slot in _profile_locks else None
+
+def profile_reset_due(slot, uses):
+    """True once an owned profile served PROFILE_RESET_EVERY searches, so its disk cache can't grow without bound"""
+    if owned_profile_dir(slot) is None or not Config.PROFILE_RESET_EVERY:
+        return False
+    return uses >= Config.PROFILE_RESET_EVERY
+
+def wipe_profile(slot, uses):
+    """Delete a slot's profile, its browser must have quit"""
+    profile_dir = owned_profile_dir(slot)
+    if profile_dir is None:
+        return
+    logger.info(f"Resetting Chrome profile {profile_dir} after {uses} searches")
+    shutil.rmtree(profile_dir, ignore_errors=True)
+
+def profile_size_mb(profile_dir):
+    """Disk usage of a profile directory in MB"""
+    total = 0
+    for root, dirs, files in os.walk(profile_dir):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total / (1024 * 1024)
+
+def prepare_profile_dir(profile_dir):
+    """Wipe a profile before launch if it grew over PROFILE_MAX_SIZE_MB"""
+    if profile_dir is None or not os.path.isdir(profile_dir):
+        return
+    size = profile_size_mb(profile_dir)
+    if size > Config.PROFILE_MAX_SIZE_MB:
+        logger.info(f"Profile {profile_dir} is {size:.0f} MB, resetting it")
+        shutil.rmtree(profile_dir, ignore_errors=True)
+
+def launch_with_profile(factory, slot):
+    """Call the driver factory, giving it the slot's persistent profile if enabled and free"""
+    profile_dir = claim_profile_dir(slot)
+    if profile_dir is None:
+        return factory()
+    prepare_profile_dir(profile_dir)
+    return factory(profile_dir=profile_dir)
+
+class DriverPool:
+    """Keep a fixed number of warm Chrome drivers and lend them out to searches"""
+
+    def __init__(self, factory, size=None, acquire_timeout=None):
+        # factory must return a new driver, it gets a profile_dir argument when persistent profiles are on
+        self.factory = factory
+        self.size = size if size is not None else Config.DRIVER_POOL_SIZE
+        self.acquire_timeout = acquire_timeout if acquire_timeout is not None else Config.DRIVER_POOL_ACQUIRE_TIMEOUT
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        # Each driver owns a slot, which is also the key of its persistent profile
+        self._free_slots = list(range(self.size))
+        self._slot_of = {}
+        self._uses = {}
+        self._closed = False
+
+    def _reserve_slot(self):
+        with self._lock:
+            if self._closed or not self._free_slots:
+                return None
+            return self._free_slots.pop(0)
+
+    def _free_slot(self, slot):
+        with self._lock:
+            self._free_slots.append(slot)
+
+    def _create_driver(self, slot):
+        """Launch a new driver for the pool in the given slot"""
+        logger.info(f"Launching a new Chrome driver for pool slot {slot}...")
+        try:
+            driver = launch_with_profile(self.factory, slot)
+        except Exception:
+            self._free_slot(slot)
+            raise
+        with self._lock:
+            self._slot_of[driver] = slot
+            self._uses.setdefault(slot, 0)
+        return driver
+
+    def _is_healthy(self, driver):
+        """Check that the browser behind a driver still answers commands"""
+        try:
+            driver.execute_script("return 1")
+            return bool(driver.window_handles)
+        except Exception as e:
+            logger.warning(f"Pooled driver failed health check: {e}")
+            return False
+
+    def _reset(self, driver):
+        """Close extra tabs and go back to a blank page before the next use"""
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        driver.get("about:blank")
+
+    def _quit(self, driver):
+        """Quit a driver and return the slot it was using"""
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.debug(f"Error while quitting driver: {e}")
+        with self._lock:
+            return self._slot_of.pop(driver)
+
+    def _discard(self, driver):
+        """Quit a driver and free its slot"""
+        self._free_slot(self._quit(driver))
+
+    def _reset_profile(self, driver):
+        """Replace a driver by a fresh one on a wiped profile, keeping its slot"""
+        slot = self._quit(driver)
+        wipe_profile(slot, self._uses[slot])
+        self._uses[slot] = 0
+        try:
+            self._idle.put(self._create_driver(slot))
+        except Exception as e:
+            logger.error(f"Could not relaunch driver after profile reset: {e}")
+
+    def fill(self):
+        """Launch drivers until the pool is full, so the first request doesn't pay for it"""
+        while True:
+            slot = self._reserve_slot()
+            if slot is None:
+                break
+            try:
+                self._idle.put(self._create_driver(slot))
+            except Exception as e:
+                logger.error(f"Could not launch a driver while filling the pool: {e}")
+                break
+        logger.info(f"Driver pool ready with {self._idle.qsize()} idle driver(s)")
+
+    def acquire(self):
+        """Get a healthy driver, launching or replacing one if needed"""
+        while True:
+            if self._closed:
+                raise RuntimeError("Driver pool is closed")
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                slot = self._reserve_slot()
+                if slot is not None:
+                    return self._create_driver(slot)
+                try:
+                    driver = self._idle.get(timeout=self.acquire_timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"No driver available after {self.acquire_timeout}s")
+
+            if self._is_healthy(driver):
+                return driver
+            # Crashed browser: drop it, the next loop iteration launches a replacement
+            logger.warning("Replacing crashed driver")
+            self._discard(driver)
+
+    def release(self, driver, discard=False):
+        """Give a driver back to the pool, resetting it for the next search"""
+        if discard or self._closed:
+            self._discard(driver)
+            return
+        with self._lock:
+            slot = self._slot_of[driver]
+            self._uses[slot] += 1
+        if profile_reset_due(slot, self._uses[slot]):
+            self._reset_profile(driver)
+            return
+        try:
+            self._reset(driver)
+        except Exception as e:
+            logger.warning(f"Could not reset driver, discarding it: {e}")
+            self._discard(driver)
+            return
+        self._idle.put(driver)
+
+    @contextmanager
+    def driver(self):
+        """Borrow a driver for the duration of a with block"""
+        driver = self.acquire()
+        try:
+            yield driver
+        except BaseException:
+            # Don't hand a browser in an unknown state to the next request
+            self.release(driver, discard=not self._is_healthy(driver))
+            raise
+        else:
+            self.release(driver)
+
+    def close(self):
+        """Quit every idle driver and refuse new acquisitions"""
+        self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+        logger.info("Driver pool closed")
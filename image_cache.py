@@ -0,0 +1,153 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from PIL import Image
+from config import Config
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+def compute_image_hash(image_path, hash_size=None):
+    """Compute the difference hash (dHash) of an image, robust to resizing and re-encoding"""
+    if hash_size is None:
+        hash_size = Config.IMAGE_HASH_SIZE
+    with Image.open(image_path) as img:
+        # One extra column so each row gives hash_size left/right comparisons
+        small = img.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+        pixels = list(small.getdata())
+
+    image_hash = 0
+    for row in range(hash_size):
+        row_start = row * (hash_size + 1)
+        for col in range(hash_size):
+            bit = pixels[row_start + col] > pixels[row_start + col + 1]
+            image_hash = (image_hash << 1) | bit
+    return image_hash
+
+def hamming_distance(hash_a, hash_b):
+    """Number of differing bits between two hashes"""
+    return bin(hash_a ^ hash_b).count("1")
+
+class BKTree:
+    """Burkhard-Keller tree over image hashes, for fast lookups within a Hamming distance"""
+
+    def __init__(self):
+        # Each node is [hash, {distance: child_node}]
+        self._root = None
+        self.size = 0
+
+    def add(self, image_hash):
+        if self._root is None:
+            self._root = [image_hash, {}]
+            self.size = 1
+            return
+        node = self._root
+        while True:
+            distance = hamming_distance(image_hash, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = [image_hash, {}]
+                self.size += 1
+                return
+            node = child
+
+    def search(self, image_hash, max_distance):
+        """Return (distance, hash) pairs within max_distance, closest first"""
+        if self._root is None:
+            return []
+        matches = []
+        candidates = [self._root]
+        while candidates:
+            node_hash, children = candidates.pop()
+            distance = hamming_distance(image_hash, node_hash)
+            if distance <= max_distance:
+                matches.append((distance, node_hash))
+            # Triangle inequality: only subtrees in this distance range can match
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    candidates.append(child)
+        return sorted(matches)
+
+class LensResultCache:
+    """In-memory cache of Lens results keyed by perceptual image hash, with TTL and LRU eviction"""
+
+    def __init__(self, max_entries=None, ttl=None, max_distance=None):
+        self.max_entries = max_entries if max_entries is not None else Config.LENS_CACHE_MAX_ENTRIES
+        self.ttl = ttl if ttl is not None else Config.LENS_CACHE_TTL
+        self.max_distance = max_distance if max_distance is not None else Config.LENS_CACHE_MAX_DISTANCE
+        self._entries = OrderedDict()
+        self._tree = BKTree()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _is_expired(self, entry, now):
+        return self.ttl is not None and now - entry["created"] > self.ttl
+
+    def _rebuild_tree(self):
+        # The BK-tree can't delete nodes, so rebuild it once evicted hashes dominate
+        self._tree = BKTree()
+        for image_hash in self._entries:
+            self._tree.add(image_hash)
+
+    def lookup(self, image_hash):
+        """Return (hash, entry) of the closest cached entry within the Hamming threshold, or None
+
+        The hash is the one the entry is stored under, which a near-duplicate image doesn't share
+        """
+        now = time.time()
+        with self._lock:
+            for distance, candidate in self._tree.search(image_hash, self.max_distance):
+                entry = self._entries.get(candidate)
+                if entry is None:
+                    continue
+                if self._is_expired(entry, now):
+                    del self._entries[candidate]
+                    continue
+                # A search that found nothing is no answer for this image
+                if not entry["links"]:
+                    continue
+                self._entries.move_to_end(candidate)
+                self.hits += 1
+                logger.info(f"Lens cache hit at Hamming distance {distance}")
+                return candidate, entry
+            self.misses += 1
+            return None
+
+    def store(self, image_hash, links, analysis=None):
+        """Cache the extracted links (and optionally the final analysis) of an image"""
+        with self._lock:
+            self._entries[image_hash] = {
+                "links": links,
+                "analysis": analysis,
+                "created": time.time(),
+            }
+            self._entries.move_to_end(image_hash)
+            self._tree.add(image_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if self._tree.size > 2 * len(self._entries) + 1:
+                self._rebuild_tree()
+
+    def set_analysis(self, image_hash, analysis):
+        """Attach the final analysis to an entry that is already cached"""
+        with self._lock:
+            entry = self._entries.get(image_hash)
+            if entry is not None:
+                entry["analysis"] = analysis
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+# Shared by every request of this process
+LENS_RESULT_CACHE = LensResultCache()
@@ -0,0 +1,86 @@
+import io
+import logging
+import os
+from PIL import Image, ImageOps
+from config import Config
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# File extension to use for each Pillow format
+FORMAT_EXTENSIONS = {
+    "JPEG": "jpg",
+    "PNG": "png",
+    "WEBP": "webp",
+    "GIF": "gif",
+    "BMP": "bmp",
+    "TIFF": "tiff",
+}
+
+# EXIF tag of the image orientation, 1 is upright
+ORIENTATION_TAG = 0x0112
+
+def detect_image_extension(image_bytes):
+    """Return the file extension matching the real format of the image bytes"""
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            return FORMAT_EXTENSIONS.get(img.format, Config.IMAGE_FILE_EXTENSION)
+    except Exception as e:
+        logger.warning(f"Could not detect image format, using .{Config.IMAGE_FILE_EXTENSION}: {e}")
+        return Config.IMAGE_FILE_EXTENSION
+
+def shrink_image(image_bytes, max_edge=None, output_format=None, quality=None):
+    """Downscale, strip EXIF and re-encode an image, returning (bytes, extension, transformed)
+
+    transformed is True when the pixels changed (downscaled or rotated by the EXIF orientation)
+    """
+    if max_edge is None:
+        max_edge = Config.PREPROCESS_MAX_EDGE
+    if output_format is None:
+        output_format = Config.PREPROCESS_FORMAT
+    if quality is None:
+        quality = Config.PREPROCESS_QUALITY
+
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        rotated = img.getexif().get(ORIENTATION_TAG, 1) != 1
+        resized = max(img.size) > max_edge
+        # Apply the EXIF orientation before the EXIF data is dropped
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        # JPEG has no alpha channel, flatten transparent images on white
+        if output_format == "JPEG" and img.mode != "RGB":
+            rgba = img.convert("RGBA")
+            img = Image.new("RGB", rgba.size, (255, 255, 255))
+            img.paste(rgba, mask=rgba.split()[3])
+
+        output = io.BytesIO()
+        # No exif argument: the metadata is not written to the new file
+        img.save(output, format=output_format, quality=quality, optimize=True)
+    return output.getvalue(), FORMAT_EXTENSIONS[output_format], resized or rotated
+
+def save_uploaded_image(image_bytes, path_without_extension):
+    """Save an uploaded image with its correct extension, shrinking it first if enabled
+
+    Returns the path of the saved file
+    """
+    extension = detect_image_extension(image_bytes)
+    data = image_bytes
+
+    if Config.PREPROCESS_IMAGES:
+        try:
+            shrunk, shrunk_extension, transformed = shrink_image(image_bytes)
+            # A downscaled or rotated image is always kept, otherwise the original would go out
+            # full size or with its EXIF data. Only a plain re-encode has to be smaller to be kept.
+            if transformed or len(shrunk) < len(image_bytes):
+                data, extension = shrunk, shrunk_extension
+            saved = len(image_bytes) - len(data)  # negative when the re-encoded image is bigger
+            logger.info(f"Image pre-processing: {len(image_bytes)} -> {len(data)} bytes ({saved} bytes saved)")
+        except Exception as e:
+            logger.warning(f"Image pre-processing failed, keeping the original: {e}")
+
+    image_path = f"{path_without_extension}.{extension}"
+    os.makedirs(os.path.dirname(image_path) or ".", exist_ok=True)
+    with open(image_path, "wb") as img_file:
+        img_file.write(data)
+    return image_path
@@ -0,0 +1,174 @@
+import bisect
+import contextvars
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from config import Config
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Span of the step currently running in this thread/task
+_current_span = contextvars.ContextVar("lens_current_span", default=None)
+
+class StepSpan:
+    """Timing and selector details of a single step of the Lens flow"""
+
+    def __init__(self, name, budget):
+        self.name = name
+        self.budget = budget
+        self.duration = None
+        self.strategy = None
+        self.attempts = 0
+        self.ok = True
+        self.error = None
+        self.snapshot_path = None
+        self.details = {}
+
+    def attempt(self, strategy):
+        """Record that a selector strategy is being tried"""
+        self.attempts += 1
+        logger.debug(f"[{self.name}] attempt {self.attempts}: {strategy}")
+
+    def succeed(self, strategy):
+        """Record the selector strategy that worked"""
+        self.strategy = strategy
+
+    @property
+    def fallbacks(self):
+        """Number of strategies tried before the one that worked"""
+        return max(0, self.attempts - 1)
+
+    @property
+    def over_budget(self):
+        return self.duration is not None and self.budget is not None and self.duration > self.budget
+
+    def to_dict(self):
+        return {
+            "step": self.name,
+            "duration": round(self.duration, 3) if self.duration is not None else None,
+            "budget": self.budget,
+            "ok": self.ok,
+            "strategy": self.strategy,
+            "attempts": self.attempts,
+            "fallbacks": self.fallbacks,
+            "error": self.error,
+            "snapshot": self.snapshot_path,
+            "details": self.details,
+        }
+
+class LensTrace:
+    """Structured trace of one Google Lens search, one span per step"""
+
+    def __init__(self, trace_id=None):
+        self.trace_id = trace_id or str(uuid.uuid4())
+        self.spans = []
+        # Route that uploaded the image: "fast_path" or "lens_button"
+        self.path = None
+
+    @contextmanager
+    def step(self, name, driver=None):
+        """Time a step, and save the page HTML if it fails or goes over its budget"""
+        span = StepSpan(name, Config.TRACE_STEP_BUDGETS.get(name))
+        self.spans.append(span)
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.ok = False
+            span.error = str(e)
+            raise
+        finally:
+            span.duration = time.perf_counter() - start
+            _current_span.reset(token)
+            STEP_HISTOGRAMS.observe(name, span.duration)
+            if span.over_budget:
+                logger.warning(f"Step '{name}' took {span.duration:.2f}s (budget {span.budget}s)")
+            if driver is not None and (span.over_budget or not span.ok):
+                span.snapshot_path = self._save_snapshot(driver, span)
+
+    def _save_snapshot(self, driver, span):
+        """Write the current page HTML to the trace directory"""
+        if not Config.SAVE_SLOW_STEP_HTML:
+            return None
+        try:
+            os.makedirs(Config.TRACE_DIR, exist_ok=True)
+            snapshot_path = f"{Config.TRACE_DIR}/{self.trace_id}_{span.name}.html"
+            with open(snapshot_path, 'w', encoding='utf-8') as f:
+                f.write(driver.page_source)
+            logger.info(f"Saved page HTML for step '{span.name}' to {snapshot_path}")
+            return snapshot_path
+        except Exception as e:
+            logger.error(f"Could not save page HTML for step '{span.name}': {e}")
+            return None
+
+    def succeeded(self, name):
+        """Whether the last span of a step ran and succeeded"""
+        spans = [span for span in self.spans if span.name == name]
+        return bool(spans) and spans[-1].ok
+
+    @property
+    def total_duration(self):
+        return sum(span.duration or 0 for span in self.spans)
+
+    def summary(self):
+        """One line summary of step durations, for the logs"""
+        parts = [f"{span.name}={span.duration:.2f}s" for span in self.spans if span.duration is not None]
+        return f"total={self.total_duration:.2f}s " + " ".join(parts)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "path": self.path,
+            "total_duration": round(self.total_duration, 3),
+            "steps": [span.to_dict() for span in self.spans],
+        }
+
+class StepHistograms:
+    """Thread-safe per-step latency histograms, aggregated over all searches"""
+
+    def __init__(self, buckets=None):
+        self.buckets = sorted(buckets or Config.TRACE_HISTOGRAM_BUCKETS)
+        self._lock = threading.Lock()
+        self._steps = {}
+
+    def observe(self, step, seconds):
+        with self._lock:
+            stats = self._steps.setdefault(step, {
+                "count": 0,
+                "sum": 0.0,
+                "max": 0.0,
+                "counts": [0] * (len(self.buckets) + 1),
+            })
+            stats["count"] += 1
+            stats["sum"] += seconds
+            stats["max"] = max(stats["max"], seconds)
+            stats["counts"][bisect.bisect_left(self.buckets, seconds)] += 1
+
+    def snapshot(self):
+        """Return the histograms as plain dicts, with bucket upper bounds as labels"""
+        labels = [f"<={bucket}" for bucket in self.buckets] + [f">{self.buckets[-1]}"]
+        with self._lock:
+            return {
+                step: {
+                    "count": stats["count"],
+                    "mean": round(stats["sum"] / stats["count"], 3),
+                    "max": round(stats["max"], 3),
+                    "buckets": dict(zip(labels, stats["counts"])),
+                }
+                for step, stats in self._steps.items()
+            }
+
+# Aggregated over every search run by this process
+STEP_HISTOGRAMS = StepHistograms()
+
+def current_span():
+    """Return the span of the running step, or a throwaway one outside of a trace"""
+    span = _current_span.get()
+    if span is None:
+        return StepSpan("untraced", None)
+    return span
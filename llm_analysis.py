@@ -1,15 +1,87 @@
 import os
-from openai import OpenAI
+import asyncio
+import concurrent.futures
+import random
+import threading
+import time
+from collections import Counter, deque
+from urllib.parse import urlparse
+import httpx
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
 import logging
 import argparse
 from config import Config
+from llm_cache import get_llm_cache, response_cache_key
+from context_budget import content_token_budget, fit_to_budget
+from openrouter_free_list import get_free_model_ids
 from secret_key import API_KEY
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
-def get_llm_analysis(content, system_prompt=None, base_url=None, model=None, temperature=None, api_key=None):
-    """Process the text content through OpenAI API"""
+# Long-lived clients keyed by (base_url, api_key), so connections to the provider are reused across calls
+_clients = {}
+_async_clients = {}
+_clients_lock = threading.Lock()
+
+def _client_options():
+    """Pool limits, timeouts and retry policy shared by the sync and async clients"""
+    return {
+        "limits": httpx.Limits(
+            max_connections=Config.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=Config.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=Config.LLM_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(Config.LLM_TIMEOUT, connect=Config.LLM_CONNECT_TIMEOUT),
+    }
+
+def get_llm_client(base_url, api_key):
+    """Return the shared OpenAI client of a provider, creating it on first use"""
+    key = (base_url, api_key)
+    with _clients_lock:
+        if key not in _clients:
+            options = _client_options()
+            _clients[key] = OpenAI(
+                base_url=base_url,
+                api_key=api_key,
+                max_retries=Config.LLM_MAX_RETRIES,
+                timeout=options["timeout"],
+                http_client=DefaultHttpxClient(**options),
+            )
+        return _clients[key]
+
+def get_async_llm_client(base_url, api_key):
+    """Return the shared AsyncOpenAI client of a provider for the running event loop"""
+    # An async connection pool belongs to the loop that created it
+    key = (asyncio.get_running_loop(), base_url, api_key)
+    with _clients_lock:
+        if key not in _async_clients:
+            options = _client_options()
+            _async_clients[key] = AsyncOpenAI(
+                base_url=base_url,
+                api_key=api_key,
+                max_retries=Config.LLM_MAX_RETRIES,
+                timeout=options["timeout"],
+                http_client=DefaultAsyncHttpxClient(**options),
+            )
+        return _async_clients[key]
+
+async def close_llm_clients():
+    """Close the clients of this process, the async ones of the running loop included"""
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        clients = list(_clients.values())
+        async_clients = [client for key, client in _async_clients.items() if key[0] is loop]
+        _clients.clear()
+        for key in [key for key in _async_clients if key[0] is loop]:
+            del _async_clients[key]
+    for client in clients:
+        client.close()
+    for client in async_clients:
+        await client.close()
+
+def _llm_settings(system_prompt, base_url, model, temperature, api_key):
+    """Fill in the configuration defaults of an LLM call"""
     # Use default system prompt if not provided
     if system_prompt is None:
         system_prompt = Config.SYSTEM_PROMPT
@@ -25,35 +97,508 @@ def get_llm_analysis(content, system_prompt=None, base_url=None, model=None, tem
     # Use default API key if not provided
     if api_key is None:
         api_key = API_KEY
+    return system_prompt, base_url, model, temperature, api_key
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+class ModelCandidate:
+    """A model at a provider, one of the models the router can send an analysis to"""
+
+    def __init__(self, model, base_url=None, api_key=None):
+        self.model = model
+        self.base_url = base_url or Config.BASE_URL
+        self.api_key = api_key or API_KEY
+        # The model ID, with the provider host when it isn't the default one
+        self.label = model if self.base_url == Config.BASE_URL else f"{model}@{urlparse(self.base_url).netloc}"
+
+    @classmethod
+    def from_config(cls, entry):
+        if isinstance(entry, str):
+            return cls(entry)
+        return cls(entry["model"], entry.get("base_url"), entry.get("api_key"))
+
+class ModelStats:
+    """Rolling latencies and outcomes of one model, with its circuit breaker state"""
+
+    def __init__(self):
+        self.latencies = deque(maxlen=Config.MODEL_ROUTER_WINDOW)  # seconds, of successful requests
+        self.outcomes = deque(maxlen=Config.MODEL_ROUTER_WINDOW)  # True for a success
+        self.requests = 0
+        self.errors = Counter()
+        self.consecutive_failures = 0
+        self.open_until = 0
+
+    def latency_percentile(self, fraction):
+        if not self.latencies:
+            return None
+        return _percentile(sorted(self.latencies), fraction)
+
+    @property
+    def success_rate(self):
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 1.0
+
+    def expected_latency(self):
+        """Median latency divided by the recent success rate, so a fast model that fails often ranks lower"""
+        p50 = self.latency_percentile(0.5)
+        if p50 is None:
+            return float('inf')
+        return p50 / max(self.success_rate, 0.1)
+
+class ModelRouter:
+    """Sends each analysis to the fastest healthy candidate model, optionally hedged with the next one
+    
+    Untried models are ranked first until they have MODEL_ROUTER_MIN_SAMPLES requests, a model
+    failing MODEL_ROUTER_BREAKER_FAILURES times in a row is skipped for a cool-down. When the
+    chosen model fails, the next one is tried. With MODEL_HEDGING, the next one is also started
+    when the first hasn't answered within its p90 latency, the first answer wins.
+    """
+
+    def __init__(self, candidates):
+        self.candidates = candidates
+        self._stats = {candidate.label: ModelStats() for candidate in candidates}
+        self._lock = threading.Lock()
+        self.hedges = 0
+        self.hedge_wins = 0
+        # Any candidate's answer will do, so they share their cache entries
+        self.cache_name = "router:" + ",".join(candidate.label for candidate in candidates)
+
+    def ranked(self):
+        """Candidates best first: untried ones, then healthy ones by expected latency, then those with an open circuit"""
+        now = time.time()
+        with self._lock:
+            healthy = [c for c in self.candidates if self._stats[c.label].open_until <= now]
+            untried = [c for c in healthy if self._stats[c.label].requests < Config.MODEL_ROUTER_MIN_SAMPLES]
+            measured = sorted(
+                (c for c in healthy if self._stats[c.label].requests >= Config.MODEL_ROUTER_MIN_SAMPLES),
+                key=lambda c: self._stats[c.label].expected_latency(),
+            )
+            broken = sorted((c for c in self.candidates if c not in healthy), key=lambda c: self._stats[c.label].open_until)
+        order = untried + measured
+        if len(order) > 1 and random.random() < Config.MODEL_ROUTER_EXPLORE:
+            # Now and then a slower model goes first, otherwise its stats would never catch up with a recovery
+            order.insert(0, order.pop(random.randrange(1, len(order))))
+        return order + broken
+
+    def record(self, candidate, latency, error=None):
+        """Record a completion of a candidate: its latency in seconds, or the exception it failed with"""
+        with self._lock:
+            stats = self._stats[candidate.label]
+            stats.requests += 1
+            stats.outcomes.append(error is None)
+            if error is None:
+                stats.latencies.append(round(latency, 3))
+                stats.consecutive_failures = 0
+                return
+            stats.errors[type(error).__name__] += 1
+            stats.consecutive_failures += 1
+            if stats.consecutive_failures >= Config.MODEL_ROUTER_BREAKER_FAILURES:
+                if stats.open_until <= time.time():
+                    logger.warning(f"Skipping model {candidate.label} for {Config.MODEL_ROUTER_BREAKER_COOLDOWN}s "
+                                   f"after {stats.consecutive_failures} failures in a row")
+                stats.open_until = time.time() + Config.MODEL_ROUTER_BREAKER_COOLDOWN
+
+    def hedge_delay(self, candidate):
+        """Seconds to wait for a candidate before starting the next one, None when not hedging"""
+        if not Config.MODEL_HEDGING:
+            return None
+        with self._lock:
+            stats = self._stats[candidate.label]
+            if len(stats.latencies) < Config.MODEL_ROUTER_MIN_SAMPLES:
+                return None
+            return max(Config.MODEL_HEDGE_MIN_DELAY, stats.latency_percentile(Config.MODEL_HEDGE_PERCENTILE))
+
+    def _hedged(self, candidate):
+        with self._lock:
+            self.hedges += 1
+        logger.info(f"No answer from {candidate.label} within its p{round(Config.MODEL_HEDGE_PERCENTILE * 100)}, hedging")
+
+    def _answered(self, candidate, hedged, start):
+        if candidate in hedged:
+            with self._lock:
+                self.hedge_wins += 1
+        logger.info(f"Answer from {candidate.label} after {time.perf_counter() - start:.2f}s")
+
+    def _complete(self, candidate, messages):
+        start = time.perf_counter()
+        try:
+            response = get_llm_client(candidate.base_url, candidate.api_key).chat.completions.create(
+                model=candidate.model,
+                messages=messages,
+            )
+            result = response.choices[0].message.content
+            if not result:
+                raise ValueError("Empty response")
+        except Exception as e:
+            self.record(candidate, time.perf_counter() - start, e)
+            raise
+        self.record(candidate, time.perf_counter() - start)
+        return result
+
+    async def _complete_async(self, candidate, messages):
+        start = time.perf_counter()
+        try:
+            response = await get_async_llm_client(candidate.base_url, candidate.api_key).chat.completions.create(
+                model=candidate.model,
+                messages=messages,
+            )
+            result = response.choices[0].message.content
+            if not result:
+                raise ValueError("Empty response")
+        except asyncio.CancelledError:
+            # Lost a hedge, says nothing about the model
+            raise
+        except Exception as e:
+            self.record(candidate, time.perf_counter() - start, e)
+            raise
+        self.record(candidate, time.perf_counter() - start)
+        return result
+
+    def complete(self, messages):
+        """Return (text, candidate) of the first model to answer, raise the last error if all failed"""
+        attempts = self.ranked()[:Config.MODEL_ROUTER_ATTEMPTS]
+        start = time.perf_counter()
+        launched = []
+        hedged = []  # candidates started by a hedge rather than after a failure
+        pending = {}
+        last_error = None
+
+        def launch():
+            candidate = attempts[len(launched)]
+            launched.append(candidate)
+            pending[_hedge_executor.submit(self._complete, candidate, messages)] = candidate
+            return time.perf_counter()
+
+        last_launch = launch()
+        while pending:
+            timeout = None
+            delay = self.hedge_delay(launched[-1]) if len(launched) < len(attempts) else None
+            if delay is not None:
+                timeout = max(0, last_launch + delay - time.perf_counter())
+            done, _ = concurrent.futures.wait(pending, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+            if not done:
+                self._hedged(launched[-1])
+                last_launch = launch()
+                hedged.append(launched[-1])
+                continue
+            for future in done:
+                candidate = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.warning(f"Model {candidate.label} failed: {e}")
+                    last_error = e
+                    continue
+                # A slower request still running finishes in its thread and is recorded then
+                self._answered(candidate, hedged, start)
+                return result, candidate
+            if not pending and len(launched) < len(attempts):
+                last_launch = launch()
+        raise last_error
+
+    async def complete_async(self, messages):
+        """Same as complete, the losing request of a hedge is cancelled"""
+        attempts = self.ranked()[:Config.MODEL_ROUTER_ATTEMPTS]
+        start = time.perf_counter()
+        launched = []
+        hedged = []  # candidates started by a hedge rather than after a failure
+        pending = {}
+        last_error = None
+
+        def launch():
+            candidate = attempts[len(launched)]
+            launched.append(candidate)
+            pending[asyncio.ensure_future(self._complete_async(candidate, messages))] = candidate
+            return time.perf_counter()
+
+        last_launch = launch()
+        try:
+            while pending:
+                timeout = None
+                delay = self.hedge_delay(launched[-1]) if len(launched) < len(attempts) else None
+                if delay is not None:
+                    timeout = max(0, last_launch + delay - time.perf_counter())
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self._hedged(launched[-1])
+                    last_launch = launch()
+                    hedged.append(launched[-1])
+                    continue
+                for task in done:
+                    candidate = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        logger.warning(f"Model {candidate.label} failed: {e}")
+                        last_error = e
+                        continue
+                    self._answered(candidate, hedged, start)
+                    return result, candidate
+                if not pending and len(launched) < len(attempts):
+                    last_launch = launch()
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self):
+        """Summary per model, in the current ranking order"""
+        now = time.time()
+        ranking = [candidate.label for candidate in self.ranked()]
+        with self._lock:
+            models = {}
+            for label in ranking:
+                stats = self._stats[label]
+                models[label] = {
+                    "requests": stats.requests,
+                    "p50_latency": stats.latency_percentile(0.5),
+                    "p90_latency": stats.latency_percentile(0.9),
+                    "success_rate": round(stats.success_rate, 3),
+                    "errors": dict(stats.errors),
+                    "circuit_open_for": round(stats.open_until - now) if stats.open_until > now else 0,
+                }
+            return {"models": models, "hedges": self.hedges, "hedge_wins": self.hedge_wins}
+
+# Sync hedges run in these threads, a losing request can't be interrupted and finishes in the background
+_hedge_executor = concurrent.futures.ThreadPoolExecutor(thread_name_prefix="llm-router")
+
+# Seconds before a router that could not be built (no candidate or free list) is built again
+MODEL_ROUTER_RETRY = 300
+
+_model_router = None
+_model_router_retry_at = 0
+_model_router_lock = threading.Lock()
+
+def _router_candidates():
+    """Candidate models, and whether the free model list was wanted but could not be fetched"""
+    candidates = [ModelCandidate.from_config(entry) for entry in Config.MODEL_CANDIDATES]
+    free_list_failed = False
+    if Config.MODEL_CANDIDATES_FREE_LIST:
+        try:
+            model_ids = get_free_model_ids()[:Config.MODEL_CANDIDATES_FREE_LIST]
+            if not model_ids:
+                raise ValueError("the free model list is empty")
+            candidates += [ModelCandidate(model_id) for model_id in model_ids]
+        except Exception as e:
+            logger.error(f"Could not fetch the free model list: {e}")
+            free_list_failed = True
+    # Drop repeats, keep the configured order
+    unique = {}
+    for candidate in candidates:
+        unique.setdefault(candidate.label, candidate)
+    return list(unique.values()), free_list_failed
+
+def get_model_router():
+    """Return the model router of this process, or None when no candidate models are configured
+
+    Fetches the free model list on first use, so async code goes through get_model_router_async.
+    A build without the free list is tried again after MODEL_ROUTER_RETRY, not on every call.
+    """
+    global _model_router, _model_router_retry_at
+    if not Config.MODEL_CANDIDATES and not Config.MODEL_CANDIDATES_FREE_LIST:
+        return None
+    with _model_router_lock:
+        if not _model_router_stale():
+            return _model_router
+        candidates, free_list_failed = _router_candidates()
+        _model_router_retry_at = time.time() + MODEL_ROUTER_RETRY if free_list_failed or not candidates else 0
+        if not candidates:
+            logger.error(f"No candidate model to route analyses over, trying again in {MODEL_ROUTER_RETRY}s")
+        elif _model_router is None or not free_list_failed:
+            # A router missing the free models is replaced once the list is fetched, not by another partial one
+            _model_router = ModelRouter(candidates)
+            logger.info(f"Routing analyses over {len(candidates)} models: {', '.join(c.label for c in candidates)}")
+        return _model_router
+
+def _model_router_stale():
+    """Whether the router is still to be built, or its failed build is due for a retry"""
+    if _model_router_retry_at:
+        return time.time() >= _model_router_retry_at
+    return _model_router is None
+
+async def get_model_router_async():
+    """get_model_router for the event loop, building the router in a thread"""
+    if (not Config.MODEL_CANDIDATES and not Config.MODEL_CANDIDATES_FREE_LIST) or not _model_router_stale():
+        return _model_router
+    return await asyncio.to_thread(get_model_router)
+
+def _budget_models(router, model):
+    """Models whose context windows bound the prompt: every router candidate, or the one model"""
+    return [candidate.model for candidate in router.candidates] if router is not None else [model]
+
+def analysis_token_budget(system_prompt=None):
+    """Tokens of scraped content the next analysis can take, None when context budgeting is disabled"""
+    if not Config.CONTEXT_BUDGET_ENABLED:
+        return None
+    if system_prompt is None:
+        system_prompt = Config.SYSTEM_PROMPT
+    return content_token_budget(_budget_models(get_model_router(), Config.MODEL), system_prompt)
+
+def _fit_content(content, router, model, system_prompt):
+    """Cut the content to the context budget of the models it may be sent to"""
+    if not Config.CONTEXT_BUDGET_ENABLED:
+        return content
+    return fit_to_budget(content, content_token_budget(_budget_models(router, model), system_prompt))
+
+def get_llm_analysis(content, system_prompt=None, base_url=None, model=None, temperature=None, api_key=None,
+                     use_cache=True):
+    """Process the text content through OpenAI API
+    
+    Identical calls are answered from the LLM response cache, use_cache=False asks the model again
+    and replaces the cached response.
+    Without an explicit model, base URL or API key, the model router picks the model when configured.
+    """
+    router = get_model_router() if model is None and base_url is None and api_key is None else None
+    system_prompt, base_url, model, temperature, api_key = _llm_settings(system_prompt, base_url, model, temperature, api_key)
+    content = _fit_content(content, router, model, system_prompt)
+    
+    # Without use_cache the model is asked again, its answer still replaces the cached one
+    llm_cache = get_llm_cache()
+    if llm_cache is not None:
+        cache_model = router.cache_name if router else model
+        cache_key = response_cache_key(cache_model, base_url, system_prompt, content)
+        cached = llm_cache.lookup(cache_key) if use_cache else None
+        if cached is not None:
+            return cached
         
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": content}
+    ]
     try:
-        # Initialize the client with OpenRouter
-        client = OpenAI(
-            base_url=base_url,
-            api_key=api_key,
-        )
+        start = time.perf_counter()
+        if router is not None:
+            result, _ = router.complete(messages)
+        else:
+            client = get_llm_client(base_url, api_key)
+            
+            # Create the completion
+            logger.info("Sending request to OpenRouter API")
+            logger.info(f"Using model: {model}")
+            response = client.chat.completions.create(
+                model=model,
+                messages=messages,
+            )
+            
+            # Extract the response text
+            result = response.choices[0].message.content
         
-        # Create the completion
-        logger.info("Sending request to OpenRouter API")
-        logger.info(f"Using model: {model}")
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": content}
-            ],
-        )
+        logger.info(f"Received {len(result)} chars response from OpenRouter")
+        if llm_cache is not None:
+            llm_cache.store(cache_key, result, time.perf_counter() - start)
+        return result
         
-        # Extract the response text
-        result = response.choices[0].message.content
+    except Exception as e:
+        logger.error(f"Error processing content with OpenRouter: {e}")
+        return f"Error processing with OpenRouter: {str(e)}"
+
+async def get_llm_analysis_async(content, system_prompt=None, base_url=None, model=None, temperature=None, api_key=None,
+                                 use_cache=True):
+    """Same as get_llm_analysis, awaited without holding a worker thread"""
+    router = await get_model_router_async() if model is None and base_url is None and api_key is None else None
+    system_prompt, base_url, model, temperature, api_key = _llm_settings(system_prompt, base_url, model, temperature, api_key)
+    # The context lengths may have to be fetched, and tokenizing takes a while on long content
+    content = await asyncio.to_thread(_fit_content, content, router, model, system_prompt)
+    
+    # SQLite may wait on another process's lock, so the cache is used from a thread
+    llm_cache = get_llm_cache()
+    if llm_cache is not None:
+        cache_model = router.cache_name if router else model
+        cache_key = response_cache_key(cache_model, base_url, system_prompt, content)
+        cached = await asyncio.to_thread(llm_cache.lookup, cache_key) if use_cache else None
+        if cached is not None:
+            return cached
+    
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": content}
+    ]
+    try:
+        start = time.perf_counter()
+        if router is not None:
+            result, _ = await router.complete_async(messages)
+        else:
+            client = get_async_llm_client(base_url, api_key)
+            
+            logger.info("Sending request to OpenRouter API")
+            logger.info(f"Using model: {model}")
+            response = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+            )
+            
+            result = response.choices[0].message.content
         
         logger.info(f"Received {len(result)} chars response from OpenRouter")
+        if llm_cache is not None:
+            await asyncio.to_thread(llm_cache.store, cache_key, result, time.perf_counter() - start)
         return result
         
     except Exception as e:
         logger.error(f"Error processing content with OpenRouter: {e}")
         return f"Error processing with OpenRouter: {str(e)}"
 
+async def stream_llm_analysis(content, system_prompt=None, base_url=None, model=None, temperature=None, api_key=None,
+                              use_cache=True):
+    """Yield the analysis in text chunks as the model produces them
+    
+    A cached response comes as a single chunk. Unlike get_llm_analysis, errors are raised, not returned as text.
+    With the model router, the best ranked model streams the answer (no fallback or hedging once tokens are sent).
+    """
+    router = await get_model_router_async() if model is None and base_url is None and api_key is None else None
+    system_prompt, base_url, model, temperature, api_key = _llm_settings(system_prompt, base_url, model, temperature, api_key)
+    content = await asyncio.to_thread(_fit_content, content, router, model, system_prompt)
+    
+    llm_cache = get_llm_cache()
+    if llm_cache is not None:
+        cache_model = router.cache_name if router else model
+        cache_key = response_cache_key(cache_model, base_url, system_prompt, content)
+        cached = await asyncio.to_thread(llm_cache.lookup, cache_key) if use_cache else None
+        if cached is not None:
+            yield cached
+            return
+    
+    candidate = router.ranked()[0] if router is not None else None
+    if candidate is not None:
+        model, base_url, api_key = candidate.model, candidate.base_url, candidate.api_key
+    
+    start = time.perf_counter()
+    client = get_async_llm_client(base_url, api_key)
+    
+    logger.info("Streaming request to OpenRouter API")
+    logger.info(f"Using model: {model}")
+    parts = []
+    try:
+        stream = await client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": content}
+            ],
+            stream=True,
+        )
+        
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                if not parts:
+                    logger.info(f"First token after {time.perf_counter() - start:.2f}s")
+                parts.append(delta)
+                yield delta
+        if not parts:
+            raise ValueError("Empty response")
+    except Exception as e:
+        if candidate is not None:
+            router.record(candidate, time.perf_counter() - start, e)
+        raise
+    if candidate is not None:
+        router.record(candidate, time.perf_counter() - start)
+    
+    result = "".join(parts)
+    logger.info(f"Streamed {len(result)} chars response from OpenRouter")
+    if llm_cache is not None:
+        await asyncio.to_thread(llm_cache.store, cache_key, result, time.perf_counter() - start)
+
 # Module can be run independently
 if __name__ == "__main__":
     # Setup basic logging for standalone use
@@ -65,6 +610,7 @@ if __name__ == "__main__":
     parser.add_argument("--txt", "-t", required=True, help="Path to text file with content to analyze")
     parser.add_argument("--output", "-o", help="Output file for the analysis")
     parser.add_argument("--system-prompt", "-s", help="Custom system prompt")
+    parser.add_argument("--no-cache", action="store_true", help="Ask the model again even if this content was already analyzed")
     
     # Parse arguments
     args = parser.parse_args()
@@ -79,7 +625,7 @@ if __name__ == "__main__":
         exit(1)
     
     # Get analysis
-    analysis = get_llm_analysis(content, args.system_prompt)
+    analysis = get_llm_analysis(content, args.system_prompt, use_cache=not args.no_cache)
     
     # Output result
     if args.output:
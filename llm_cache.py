@@ -0,0 +1,72 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from config import Config
+from disk_cache import DiskCache
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+def response_cache_key(model, base_url, system_prompt, content):
+    """SHA-256 of everything that determines the completion (the temperature isn't sent to the provider)"""
+    payload = json.dumps([model, base_url, system_prompt, content], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class LLMResponseCache:
+    """Disk cache of LLM responses, content-addressed, shared by worker processes"""
+
+    def __init__(self, path=None, max_mb=None, ttl=None):
+        path = path or os.path.join(Config.CACHE_DIR, "llm_responses.sqlite")
+        max_mb = max_mb if max_mb is not None else Config.LLM_CACHE_MAX_MB
+        ttl = ttl if ttl is not None else Config.LLM_CACHE_TTL
+        self._cache = DiskCache(path, max_mb * 1024 * 1024, ttl)
+
+    def lookup(self, key):
+        """Return the cached response, or None. Counts the hit or miss and the latency a hit saved"""
+        try:
+            entry = self._cache.get(key)
+            if entry is None:
+                self._cache.incr("miss")
+                return None
+            self._cache.incr("hit")
+            self._cache.incr("latency_saved_ms", round(entry["latency"] * 1000))
+            logger.info(f"LLM cache hit, saved {entry['latency']:.1f}s")
+            return entry["response"]
+        except Exception as e:
+            logger.error(f"LLM cache lookup failed: {e}")
+            return None
+
+    def store(self, key, response, latency):
+        """Cache a response with the seconds it took, so hits can report the latency saved"""
+        try:
+            self._cache.set(key, {"response": response, "latency": latency})
+        except Exception as e:
+            logger.error(f"LLM cache store failed: {e}")
+
+    def stats(self):
+        stats = self._cache.stats()
+        counters = stats.pop("counters")
+        hits, misses = counters.get("hit", 0), counters.get("miss", 0)
+        lookups = hits + misses
+        stats.update({
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / lookups, 3) if lookups else None,
+            "latency_saved_seconds": round(counters.get("latency_saved_ms", 0) / 1000, 1),
+        })
+        return stats
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+def get_llm_cache():
+    """Return the LLM response cache of this process, or None when disabled"""
+    global _llm_cache
+    if not Config.LLM_CACHE_ENABLED:
+        return None
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = LLMResponseCache()
+        return _llm_cache
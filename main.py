@@ -1,11 +1,25 @@
 from fastapi import BackgroundTasks, FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
+from typing import Optional
 import base64
+import glob
+import json
 import os
 import uuid
-from selenium_lens_scraper import run_google_lens_search
-from bs4_small_scraper import scrape_first_urls
-from llm_analysis import get_llm_analysis
+from selenium_lens_scraper import run_google_lens_search, get_driver_pool, save_links_to_csv
+from bs4_small_scraper import ScrapeReport, scrape_first_urls_async
+from llm_analysis import (analysis_token_budget, close_llm_clients, get_llm_analysis_async, get_model_router,
+                          get_model_router_async, stream_llm_analysis)
+from context_budget import chars_for_tokens, preload_tokenizer
+from lens_tracing import LensTrace, STEP_HISTOGRAMS
+from image_cache import LENS_RESULT_CACHE, compute_image_hash
+from image_preprocessing import save_uploaded_image
+from page_cache import get_page_cache
+from llm_cache import get_llm_cache
+from domain_health import get_domain_health
 import logging
 from config import Config
 
@@ -21,13 +35,49 @@ Config.create_dirs()
 
 app = FastAPI(title="Google Lens Scraper API")
 
+@app.on_event("startup")
+def warm_driver_pool():
+    # Launch the Chrome drivers now so the first request doesn't wait for them
+    pool = get_driver_pool()
+    if pool is not None:
+        pool.fill()
+
+@app.on_event("startup")
+def warm_model_router():
+    # Fetch the free model list before serving, not during the first analysis
+    get_model_router()
+
+@app.on_event("startup")
+def warm_tokenizer():
+    # tiktoken downloads its BPE file on first use
+    if Config.CONTEXT_BUDGET_ENABLED:
+        preload_tokenizer()
+
+@app.on_event("shutdown")
+def close_driver_pool():
+    pool = get_driver_pool()
+    if pool is not None:
+        pool.close()
+
+@app.on_event("shutdown")
+async def close_llm_connections():
+    await close_llm_clients()
+
+@app.on_event("shutdown")
+def save_domain_health():
+    domain_health = get_domain_health()
+    if domain_health is not None:
+        domain_health.save()
+
 class ImageRequest(BaseModel):
     image: str  # base64 encoded image
+    scrape_deadline: Optional[float] = None  # seconds for the scrape stage (default: Config.SCRAPE_DEADLINE_SECONDS)
+    fresh: bool = False  # ask the LLM again instead of returning a cached analysis
 
 def remove_files(request_id: str):
     if Config.REMOVE_IMAGES:
-        image_path = f"{Config.IMAGE_DIR}/image_{request_id}.{Config.IMAGE_FILE_EXTENSION}"
-        if os.path.exists(image_path):
+        # The extension depends on the uploaded image format
+        for image_path in glob.glob(f"{Config.IMAGE_DIR}/image_{request_id}.*"):
             os.remove(image_path)
             logger.info(f"Removed image file: {image_path}")
     if Config.REMOVE_CSVS:
@@ -41,11 +91,119 @@ def remove_files(request_id: str):
             os.remove(txt_path)
             logger.info(f"Removed text file: {txt_path}")
 
+def run_cached_lens_search(image_path, csv_path, trace):
+    """Run the Google Lens search unless a near-duplicate image is already cached
+    
+    Returns (links, image_hash, cached_analysis), links is None if the search failed. image_hash is
+    the key of the cache entry the analysis should be attached to.
+    """
+    if not Config.LENS_CACHE_ENABLED:
+        return run_google_lens_search(image_path, csv_path, trace=trace), None, None
+    try:
+        image_hash = compute_image_hash(image_path)
+    except Exception as e:
+        logger.warning(f"Could not hash image, skipping Lens cache: {e}")
+        return run_google_lens_search(image_path, csv_path, trace=trace), None, None
+    
+    cached = LENS_RESULT_CACHE.lookup(image_hash)
+    if cached is not None:
+        # The analysis is attached to the matched entry, whose hash differs on a near-duplicate hit
+        image_hash, entry = cached
+        if csv_path and entry["analysis"] is None:
+            save_links_to_csv(entry["links"], csv_path)
+        return entry["links"], image_hash, entry["analysis"]
+    
+    links = run_google_lens_search(image_path, csv_path, trace=trace)
+    # Empty or partial links (results wait timed out on a consent wall, a captcha...) aren't cached
+    if links and trace.succeeded("results"):
+        LENS_RESULT_CACHE.store(image_hash, links)
+    return links, image_hash, None
+
 
 @app.get("/")
 async def root():
     return {"message": "Google Lens Scraper API is running. Use /analyze endpoint with a base64 encoded image."}
 
+@app.get("/stats/lens")
+async def lens_stats():
+    # Per-step latency histograms of the Google Lens automation
+    return STEP_HISTOGRAMS.snapshot()
+
+@app.get("/stats/cache")
+async def cache_stats():
+    page_cache = get_page_cache()
+    llm_cache = get_llm_cache()
+    return {
+        "lens_results": LENS_RESULT_CACHE.stats(),
+        "pages": await run_in_threadpool(page_cache.stats) if page_cache else None,
+        "llm_responses": await run_in_threadpool(llm_cache.stats) if llm_cache else None,
+    }
+
+@app.get("/stats/domains")
+async def domain_stats():
+    # Latency, errors and circuit breaker state of the scraped domains
+    domain_health = get_domain_health()
+    return domain_health.stats() if domain_health else {}
+
+@app.get("/stats/models")
+async def model_stats():
+    # Latency, errors and hedging of the routed models
+    router = await get_model_router_async()
+    return router.stats() if router else {}
+
+async def save_request_image(request_id, image_b64):
+    """Decode, shrink and save the base64 image of a request, return its path"""
+    try:
+        img_data = base64.b64decode(image_b64)
+        image_path = await run_in_threadpool(
+            save_uploaded_image, img_data, f"{Config.IMAGE_DIR}/image_{request_id}"
+        )
+        logger.info(f"Image saved at {image_path}")
+        return image_path
+    except Exception as e:
+        logger.error(f"Failed to decode base64 image: {e}")
+        raise HTTPException(status_code=400, detail="Invalid base64 image")
+
+async def run_lens_stage(request_id, image_path):
+    """Google Lens search of the saved image, returns (csv_path, links, image_hash, cached_analysis)"""
+    # The links are passed on in memory, the CSV is only for inspection
+    csv_path = f"{Config.CSV_DIR}/results_{request_id}.csv" if Config.WRITE_LENS_CSV else None
+    logger.info(f"Starting Google Lens search for image")
+    # Run in a worker thread so several requests can use the driver pool at once
+    trace = LensTrace(request_id)
+    links, image_hash, cached_analysis = await run_in_threadpool(run_cached_lens_search, image_path, csv_path, trace)
+    if links is None:
+        raise HTTPException(status_code=500, detail="Google Lens search failed")
+    return csv_path, links, image_hash, cached_analysis
+
+async def run_scrape_stage(request_id, csv_path, links, deadline, report):
+    """Scrape the top Lens links, return the text for the LLM"""
+    txt_path = f"{Config.TXT_DIR}/content_{request_id}.txt"
+    # Scrape as much text as the models' context budget can take
+    token_budget = await run_in_threadpool(analysis_token_budget)
+    char_limit = chars_for_tokens(token_budget) if token_budget else Config.MAX_CHARACTERS_IN_SUMMARY
+    logger.info(f"Scraping content from top URLs, up to {char_limit} chars")
+    scraped_content = await scrape_first_urls_async(
+        csv_path, 
+        txt_path, 
+        max_urls=Config.MAX_URLS_TO_SCRAPE, 
+        char_limit=char_limit,
+        links=links,
+        deadline=deadline,
+        report=report
+    )
+    logger.info(f"Scraped content saved to {txt_path}")
+    return scraped_content
+
+def store_analysis(image_hash, analysis):
+    # Remember the analysis with the Lens results, so a near-duplicate image skips the whole pipeline
+    if image_hash is not None and Config.LENS_CACHE_STORE_ANALYSIS and not analysis.startswith("Error processing"):
+        LENS_RESULT_CACHE.set_analysis(image_hash, analysis)
+
+def sse_event(event, data):
+    """Format a Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @app.post("/analyze")
 async def process_image(request: ImageRequest, background_tasks: BackgroundTasks):
     try:
@@ -53,44 +211,81 @@ async def process_image(request: ImageRequest, background_tasks: BackgroundTasks
         request_id = str(uuid.uuid4())
         logger.info(f"Processing new request: {request_id}")
         
-        # Decode and save base64 image
-        image_path = f"{Config.IMAGE_DIR}/image_{request_id}.{Config.IMAGE_FILE_EXTENSION}"
-        try:
-            with open(image_path, "wb") as img_file:
-                img_data = base64.b64decode(request.image)
-                img_file.write(img_data)
-            logger.info(f"Image saved at {image_path}")
-        except Exception as e:
-            logger.error(f"Failed to decode base64 image: {e}")
-            raise HTTPException(status_code=400, detail="Invalid base64 image")
+        image_path = await save_request_image(request_id, request.image)
         
-        # Run Google Lens search
-        csv_path = f"{Config.CSV_DIR}/results_{request_id}.csv"
-        logger.info(f"Starting Google Lens search for image")
-        result = run_google_lens_search(image_path, csv_path)
-        if not result:
-            raise HTTPException(status_code=500, detail="Google Lens search failed")
-        logger.info(f"Google Lens results saved to {csv_path}")
+        csv_path, links, image_hash, cached_analysis = await run_lens_stage(request_id, image_path)
+        if cached_analysis is not None and not request.fresh:
+            logger.info(f"Returning cached analysis for a near-duplicate image")
+            background_tasks.add_task(func=remove_files, request_id=request_id)
+            return {"analysis": cached_analysis}
+        logger.info(f"Google Lens search returned {len(links)} links")
         
-        # Scrape content from URLs
-        txt_path = f"{Config.TXT_DIR}/content_{request_id}.txt"
-        logger.info(f"Scraping content from top URLs")
-        scraped_content = scrape_first_urls(
-            csv_path, 
-            txt_path, 
-            max_urls=Config.MAX_URLS_TO_SCRAPE, 
-            char_limit=Config.MAX_CHARACTERS_IN_SUMMARY
-        )
-        logger.info(f"Scraped content saved to {txt_path}")
+        scrape_report = ScrapeReport()
+        scraped_content = await run_scrape_stage(request_id, csv_path, links, request.scrape_deadline, scrape_report)
         
         # Get OpenAI analysis
         logger.info(f"Sending content to LLM for analysis")
-        analysis = get_llm_analysis(scraped_content)
+        analysis = await get_llm_analysis_async(scraped_content, use_cache=not request.fresh)
         logger.info(f"Analysis received from LLM")
+        store_analysis(image_hash, analysis)
         
         background_tasks.add_task(func=remove_files, request_id=request_id)
-        return {"analysis": analysis}
+        return {"analysis": analysis, "scrape": scrape_report.to_dict()}
         
     except Exception as e:
         logger.error(f"Error processing request: {e}")
-        raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
+
+@app.post("/analyze/stream")
+async def process_image_stream(request: ImageRequest):
+    """Same pipeline as /analyze, sent as Server-Sent Events
+    
+    Events: started, lens_done, scrape_done, token (one per chunk of the analysis), then done or error.
+    """
+    request_id = str(uuid.uuid4())
+    logger.info(f"Processing new streaming request: {request_id}")
+    # Decoded before the stream starts, so a bad image is still a plain 400
+    image_path = await save_request_image(request_id, request.image)
+    
+    async def events():
+        yield sse_event("started", {"request_id": request_id})
+        try:
+            csv_path, links, image_hash, cached_analysis = await run_lens_stage(request_id, image_path)
+            from_cache = cached_analysis is not None and not request.fresh
+            yield sse_event("lens_done", {"links": len(links), "cached_analysis": from_cache})
+            if from_cache:
+                logger.info(f"Returning cached analysis for a near-duplicate image")
+                yield sse_event("done", {"analysis": cached_analysis})
+                return
+            
+            scrape_report = ScrapeReport()
+            scraped_content = await run_scrape_stage(request_id, csv_path, links, request.scrape_deadline, scrape_report)
+            yield sse_event("scrape_done", {
+                "sources": scrape_report.sources,
+                "chars": len(scraped_content),
+                "scrape": scrape_report.to_dict(),
+            })
+            
+            logger.info(f"Streaming LLM analysis")
+            parts = []
+            async for chunk in stream_llm_analysis(scraped_content, use_cache=not request.fresh):
+                parts.append(chunk)
+                yield sse_event("token", {"text": chunk})
+            analysis = "".join(parts)
+            logger.info(f"Analysis streamed from LLM")
+            store_analysis(image_hash, analysis)
+            yield sse_event("done", {"analysis": analysis})
+        except HTTPException as e:
+            logger.error(f"Error processing streaming request: {e.detail}")
+            yield sse_event("error", {"detail": e.detail})
+        except Exception as e:
+            logger.error(f"Error processing streaming request: {e}")
+            yield sse_event("error", {"detail": f"Error processing request: {str(e)}"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # No caching or proxy buffering, the events have to reach the client as they are sent
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(remove_files, request_id=request_id),
+    )
@@ -1,8 +1,8 @@
 import requests
 
-def fetch_free_models():
+def fetch_free_models(timeout=10):
     url = "https://openrouter.ai/api/v1/models"
-    response = requests.get(url)
+    response = requests.get(url, timeout=timeout)
     # # save response to file
     # with open("openrouter_models.json", "w") as file:
     #     file.write(response.text)
@@ -20,6 +20,12 @@ def get_free_model_ids():
     free_models = fetch_free_models()
     return [model["id"] for model in free_models]
 
+def get_free_model_context_lengths():
+    # Context length (in tokens) of each free model, some models don't report one
+    free_models = fetch_free_models()
+    return {model["id"]: model["top_provider"]["context_length"]
+            for model in free_models if model["top_provider"].get("context_length")}
+
 def print_free_model_ids_and_names():
     free_models = fetch_free_models()
     for model in free_models:
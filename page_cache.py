@@ -0,0 +1,141 @@
+import logging
+import os
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from config import Config
+from disk_cache import DiskCache
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Query parameters that don't change the page content
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'msclkid')
+DEFAULT_PORTS = {'http': '80', 'https': '443'}
+
+def normalize_url(url):
+    """Cache key of a URL: lowercase scheme and host, no default port, fragment or tracking parameters, sorted query"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    host, _, port = netloc.rpartition(':')
+    if host and DEFAULT_PORTS.get(scheme) == port:
+        netloc = host
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    )
+    return urlunsplit((scheme, netloc, parts.path or '/', urlencode(query), ''))
+
+class CachedPage:
+    """Extracted text of a page, with the validators needed to revalidate it"""
+
+    def __init__(self, entry):
+        self.text = entry["text"]
+        self.complete = entry["complete"]
+        self.etag = entry.get("etag")
+        self.last_modified = entry.get("last_modified")
+        self.checked_at = entry["checked_at"]
+
+    @property
+    def fresh(self):
+        """True while the page can be served without asking the server"""
+        return time.time() - self.checked_at < Config.PAGE_CACHE_TTL
+
+    def conditional_headers(self):
+        """If-None-Match / If-Modified-Since headers, empty when the server gave no validators"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+class PageCache:
+    """Disk cache of the text extracted from scraped pages, keyed by normalized URL"""
+
+    def __init__(self, path=None, max_mb=None):
+        path = path or os.path.join(Config.CACHE_DIR, "pages.sqlite")
+        max_mb = max_mb if max_mb is not None else Config.PAGE_CACHE_MAX_MB
+        # Stale entries are kept for revalidation, the size bound does the cleanup
+        self._cache = DiskCache(path, max_mb * 1024 * 1024)
+
+    def lookup(self, url, max_chars=None):
+        """Return the cached page if it has at least max_chars of text (or all of it), else None"""
+        try:
+            entry = self._cache.get(normalize_url(url))
+        except Exception as e:
+            logger.error(f"Page cache lookup failed for {url}: {e}")
+            return None
+        if entry is None:
+            return None
+        page = CachedPage(entry)
+        # An entry cut at a smaller limit can't serve this request
+        if not page.complete and (max_chars is None or len(page.text) < max_chars):
+            return None
+        return page
+
+    def store(self, url, text, headers, complete, max_chars=None):
+        """Cache the text of a page fetched with a 200, with its ETag/Last-Modified"""
+        if max_chars is not None and len(text) > max_chars:
+            text = text[:max_chars]
+            complete = False
+        entry = {
+            "text": text,
+            "complete": complete,
+            "etag": headers.get('ETag'),
+            "last_modified": headers.get('Last-Modified'),
+            "checked_at": time.time(),
+        }
+        try:
+            self._cache.set(normalize_url(url), entry)
+        except Exception as e:
+            logger.error(f"Page cache store failed for {url}: {e}")
+
+    def revalidated(self, url, page, headers):
+        """The server answered 304 Not Modified: the cached page is fresh again"""
+        entry = {
+            "text": page.text,
+            "complete": page.complete,
+            "etag": headers.get('ETag') or page.etag,
+            "last_modified": headers.get('Last-Modified') or page.last_modified,
+            "checked_at": time.time(),
+        }
+        try:
+            self._cache.set(normalize_url(url), entry)
+        except Exception as e:
+            logger.error(f"Page cache store failed for {url}: {e}")
+
+    def record(self, outcome):
+        """Count a lookup outcome: 'hit' (no network), 'revalidated' (304) or 'miss' (page downloaded)"""
+        try:
+            self._cache.incr(outcome)
+        except Exception as e:
+            logger.error(f"Page cache counter update failed: {e}")
+
+    def stats(self):
+        stats = self._cache.stats()
+        counters = stats.pop("counters")
+        hits, revalidated, misses = (counters.get(name, 0) for name in ("hit", "revalidated", "miss"))
+        lookups = hits + revalidated + misses
+        stats.update({
+            "hits": hits,
+            "revalidated": revalidated,
+            "misses": misses,
+            "hit_ratio": round(hits / lookups, 3) if lookups else None,
+            "served_from_cache_ratio": round((hits + revalidated) / lookups, 3) if lookups else None,
+        })
+        return stats
+
+_page_cache = None
+_page_cache_lock = threading.Lock()
+
+def get_page_cache():
+    """Return the page cache of this process, or None when disabled"""
+    global _page_cache
+    if not Config.PAGE_CACHE_ENABLED:
+        return None
+    with _page_cache_lock:
+        if _page_cache is None:
+            _page_cache = PageCache()
+        return _page_cache
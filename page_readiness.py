@@ -0,0 +1,98 @@
+import logging
+import time
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+from config import Config
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Installs (once per document) a MutationObserver that stamps the time of the last DOM change,
+# then returns how long the DOM has been quiet in milliseconds
+DOM_QUIET_SCRIPT = """
+    const root = document.querySelector(arguments[0]) || document.documentElement;
+    if (!window.__openlensObserver) {
+        window.__openlensLastMutation = performance.now();
+        window.__openlensObserver = new MutationObserver(() => {
+            window.__openlensLastMutation = performance.now();
+        });
+        window.__openlensObserver.observe(root, {childList: true, subtree: true, characterData: true});
+        return 0;
+    }
+    return performance.now() - window.__openlensLastMutation;
+"""
+
+# Counts the external links currently on the page
+EXTERNAL_LINK_COUNT_SCRIPT = """
+    let count = 0;
+    for (const link of document.getElementsByTagName('a')) {
+        const href = link.href;
+        if (href && href.startsWith('http') && !link.hostname.includes('google')) {
+            count++;
+        }
+    }
+    return count;
+"""
+
+def get_wait_budget(stage):
+    """Return the wait budget in seconds configured for a stage of the Lens flow"""
+    return Config.WAIT_BUDGETS.get(stage, Config.WAIT_BUDGETS["default"])
+
+def wait_until(driver, condition, timeout, message=""):
+    """Poll condition(driver) until it returns a truthy value, or None once timeout is reached"""
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=Config.WAIT_POLL_INTERVAL).until(condition, message)
+    except TimeoutException:
+        logger.debug(f"Wait timed out after {timeout}s: {message}")
+        return None
+
+def wait_for_any_element(driver, locators, timeout):
+    """Wait until one of the (by, selector) locators matches, and return (locator, element)"""
+    def first_match(d):
+        for locator in locators:
+            elements = d.find_elements(*locator)
+            if elements:
+                return locator, elements[0]
+        return False
+    return wait_until(driver, first_match, timeout, f"any of {len(locators)} locators") or (None, None)
+
+def wait_for_document_ready(driver, timeout):
+    """Wait for document.readyState to be 'complete'"""
+    ready = wait_until(
+        driver,
+        lambda d: d.execute_script("return document.readyState") == "complete",
+        timeout,
+        "document ready"
+    )
+    return bool(ready)
+
+def wait_for_dom_quiet(driver, timeout, quiet_period=None, root_selector="body"):
+    """Wait until no DOM mutation happened for quiet_period seconds"""
+    if quiet_period is None:
+        quiet_period = Config.DOM_QUIET_PERIOD
+    quiet_ms = quiet_period * 1000
+    quiet = wait_until(
+        driver,
+        lambda d: d.execute_script(DOM_QUIET_SCRIPT, root_selector) >= quiet_ms,
+        timeout,
+        "DOM quiet"
+    )
+    return bool(quiet)
+
+def wait_for_link_count_stable(driver, timeout, stable_period=None, min_links=1):
+    """Wait until at least min_links external links are on the page and their number stops growing"""
+    if stable_period is None:
+        stable_period = Config.RESULTS_STABLE_PERIOD
+    state = {"count": -1, "since": time.monotonic()}
+
+    def count_is_stable(d):
+        count = d.execute_script(EXTERNAL_LINK_COUNT_SCRIPT)
+        now = time.monotonic()
+        if count != state["count"]:
+            state["count"], state["since"] = count, now
+            return False
+        return count >= min_links and now - state["since"] >= stable_period
+
+    stable = wait_until(driver, count_is_stable, timeout, "link count stable")
+    logger.info(f"Link count {'settled' if stable else 'still changing'} at {max(state['count'], 0)} external links")
+    return bool(stable)
@@ -12,15 +12,37 @@ from selenium.webdriver.support import expected_conditions as EC
 import os
 import logging
 import argparse
+import atexit
+import threading
 from config import Config
+from driver_pool import DriverPool
+from tab_pool import TabbedBrowserPool
+from resource_blocking import add_blocking_options, apply_blocked_urls
+from lens_tracing import LensTrace, current_span
+from page_readiness import (
+    get_wait_budget, wait_until, wait_for_any_element, wait_for_document_ready,
+    wait_for_dom_quiet, wait_for_link_count_stable
+)
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
-def setup_anti_detection_driver():
-    """Create a Chrome driver with anti-detection measures"""
+# Shared pool of warm drivers, created on first use
+_driver_pool = None
+_driver_pool_lock = threading.Lock()
+
+def setup_anti_detection_driver(profile_dir=None):
+    """Create a Chrome driver with anti-detection measures
+    
+    With a profile_dir, cookies (consent included) and the disk cache persist between launches
+    """
     options = webdriver.ChromeOptions()
     
+    # Persistent profile - configurable
+    if profile_dir is not None:
+        options.add_argument(f'--user-data-dir={profile_dir}')
+        options.add_argument(f'--disk-cache-size={Config.PROFILE_DISK_CACHE_MB * 1024 * 1024}')
+    
     # Common user agent
     user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36'
     options.add_argument(f'user-agent={user_agent}')
@@ -41,6 +63,15 @@ def setup_anti_detection_driver():
     options.add_argument('--no-sandbox')
     options.add_argument('--disable-dev-shm-usage')
     
+    # Tabs in the background must keep running at full speed when several searches share a browser
+    if Config.TABS_PER_BROWSER > 1:
+        options.add_argument('--disable-background-timer-throttling')
+        options.add_argument('--disable-backgrounding-occluded-windows')
+        options.add_argument('--disable-renderer-backgrounding')
+    
+    # Resource blocking preferences and low-memory flags - configurable
+    add_blocking_options(options)
+    
     # Headless mode - configurable
     if Config.HEADLESS_MODE:
         options.add_argument('--headless')
@@ -64,6 +95,11 @@ def setup_anti_detection_driver():
             logger.error(f"Error with Chrome: {e}")
             raise
     
+    setup_tab(driver)
+    return driver
+
+def setup_tab(driver):
+    """Apply the per-tab CDP settings (anti-detection script, blocked URLs) to the current tab"""
     # Anti-detection script
     driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
         'source': '''
@@ -89,59 +125,87 @@ def setup_anti_detection_driver():
         '''
     })
     
-    return driver
+    # Drop fonts, media and trackers we never read
+    apply_blocked_urls(driver)
+
+# Locators for the cookie consent accept button, in order of preference
+CONSENT_LOCATORS = [
+    (By.XPATH, "//button[contains(., 'accept') or contains(., 'Accept') or .//span[contains(., 'accept') or contains(., 'Accept')]]"),
+    (By.CSS_SELECTOR, "button[id*='consent' i], button[class*='consent' i]"),
+]
+
+# Elements that show the Google homepage is usable without a consent dialog
+LENS_BUTTON_SELECTOR = "[data-base-lens-url='https://lens.google.com']"
+
+def has_consent_cookie(driver):
+    """Check whether the session already accepted Google's cookie consent"""
+    try:
+        if driver.get_cookie("SOCS"):
+            return True
+        consent = driver.get_cookie("CONSENT")
+        return bool(consent and consent.get("value", "").startswith("YES"))
+    except Exception as e:
+        logger.debug(f"Could not read consent cookies: {e}")
+        return False
 
 def handle_cookie_consent(driver):
     """Handle cookie consent dialog if present"""
+    # A pooled driver that already accepted keeps the cookie, nothing to wait for
+    if has_consent_cookie(driver):
+        logger.info("Consent cookie already set, skipping consent dialog")
+        current_span().succeed("cookie_present")
+        return
+    
     logger.info("Looking for cookie consent dialog...")
     try:
-        # Wait for cookie dialog to appear (max 1 second)
-        time.sleep(1)
-        
-        # Try multiple selector approaches to find accept button
-        accept_buttons = driver.find_elements(By.XPATH, "//button[contains(., 'accept') or contains(., 'Accept') or .//span[contains(., 'accept') or contains(., 'Accept')]]")
-        
-        if not accept_buttons:
-            accept_buttons = driver.find_elements(By.CSS_SELECTOR, "button[id*='consent' i], button[class*='consent' i]")
+        # Wait until either the consent dialog or the Lens button shows up
+        locator, element = wait_for_any_element(
+            driver,
+            CONSENT_LOCATORS + [(By.CSS_SELECTOR, LENS_BUTTON_SELECTOR)],
+            get_wait_budget("cookie_consent")
+        )
         
-        if accept_buttons:
+        if locator in CONSENT_LOCATORS:
             logger.info("Cookie consent dialog found, clicking accept...")
-            accept_buttons[0].click()
-            time.sleep(0.5)  # Brief pause after clicking
+            current_span().succeed(f"consent:{locator[1]}")
+            element.click()
+            # Wait for the dialog to go away instead of a fixed pause
+            wait_until(driver, EC.staleness_of(element), get_wait_budget("cookie_consent"), "consent dialog closed")
         else:
             logger.info("No cookie consent dialog detected")
+            current_span().succeed("no_dialog")
             
     except Exception as e:
         logger.error(f"Error handling cookie dialog: {e}")
 
-def wait_for_page_load(driver, max_wait=10):
-    """Wait for page to load - simplified and faster version"""
+def wait_for_page_load(driver, max_wait=None):
+    """Wait for page to load, returning as soon as the DOM has settled"""
     logger.info("Waiting for page to load...")
+    if max_wait is None:
+        max_wait = get_wait_budget("page_load")
     
     # First wait for document.readyState to be complete
-    try:
-        WebDriverWait(driver, max_wait).until(
-            lambda d: d.execute_script("return document.readyState") == "complete"
-        )
+    if wait_for_document_ready(driver, max_wait):
         logger.info("Page reached 'complete' state")
-    except Exception as e:
-        logger.warning(f"Page took too long to reach complete state: {e}")
+    else:
+        logger.warning(f"Page took more than {max_wait}s to reach complete state")
     
     # Single scroll to trigger any lazy-loading elements
     driver.execute_script("window.scrollBy(0, 300);")
     
-    # Brief pause for any final AJAX content
-    time.sleep(1.5)
-    
-    # Check if jQuery is active (if present)
-    jquery_ready = driver.execute_script("""
-        return (typeof jQuery === 'undefined') || 
-               (jQuery.active === 0 && jQuery.ready.state === 'complete');
-    """)
+    # Wait for any final AJAX content to stop changing the DOM
+    wait_for_dom_quiet(driver, get_wait_budget("dom_quiet"))
     
-    if not jquery_ready:
-        logger.info("Waiting extra time for jQuery requests to complete")
-        time.sleep(1)
+    # Wait for jQuery requests to complete (if present)
+    wait_until(
+        driver,
+        lambda d: d.execute_script("""
+            return (typeof jQuery === 'undefined') || 
+                   (jQuery.active === 0 && jQuery.ready.state === 'complete');
+        """),
+        get_wait_budget("dom_quiet"),
+        "jQuery idle"
+    )
     
     logger.info("Page load wait completed")
 
@@ -152,13 +216,14 @@ def click_lens_button(driver):
     # Try different selector strategies (in order of preference)
     selectors = [
         # Primary selector based on data-attribute
-        "[data-base-lens-url='https://lens.google.com']",
+        LENS_BUTTON_SELECTOR,
     ]
     
     for selector in selectors:
         try:
             logger.info(f"Trying selector: {selector}")
-            wait = WebDriverWait(driver, 5)
+            current_span().attempt(selector)
+            wait = WebDriverWait(driver, get_wait_budget("lens_button"), poll_frequency=Config.WAIT_POLL_INTERVAL)
             lens_button = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, selector)))
             
             # Move mouse to button before clicking (more human-like)
@@ -167,7 +232,8 @@ def click_lens_button(driver):
             
             logger.info("Found Google Lens button, clicking...")
             lens_button.click()
-            time.sleep(1)
+            current_span().succeed(selector)
+            # The next step waits for the Lens UI itself, no pause needed here
             return True
         except Exception as e:
             logger.debug(f"Selector {selector} failed: {e}")
@@ -176,13 +242,19 @@ def click_lens_button(driver):
     logger.error("Could not find Google Lens button")
     return False
 
+def wait_for_file_input(driver):
+    """Wait for a file input to be attached to the page, or return None"""
+    locator, file_input = wait_for_any_element(
+        driver,
+        [(By.CSS_SELECTOR, "input[type='file']")],
+        get_wait_budget("file_input")
+    )
+    return file_input
+
 def find_and_click_import_option(driver):
     """Find and click the import option in Google Lens"""
     logger.info("Looking for import option...")
     
-    # Wait a moment for Lens page to load
-    time.sleep(2)
-    
     # Different selectors for the import button/link, ordered by specificity
     import_selectors = [  
         "//span[contains(text(), 'file')]",        # anglais  
@@ -194,6 +266,13 @@ def find_and_click_import_option(driver):
         "//span[contains(text(), 'αρχείο')]",     # grec  
     ]
     
+    # Wait for the Lens UI to show any of the import options instead of a fixed pause
+    wait_for_any_element(
+        driver,
+        [(By.XPATH, selector) for selector in import_selectors],
+        get_wait_budget("import_option")
+    )
+    
     # Try each selector
     for selector in import_selectors:
         try:
@@ -205,16 +284,23 @@ def find_and_click_import_option(driver):
             if "input[type='file']" in selector:
                 try:
                     # Find even if not visible
+                    current_span().attempt(selector)
                     import_element = driver.find_element(by_method, selector)
                     logger.info("Found file input element")
+                    current_span().succeed(selector)
                     return import_element
                 except Exception as e:
                     logger.debug(f"No direct file input found: {e}")
                     continue
                 
+            # Skip selectors that match nothing, the UI has already loaded by now
+            current_span().attempt(selector)
+            if not driver.find_elements(by_method, selector):
+                continue
+                
             # For visible elements
             try:
-                wait = WebDriverWait(driver, 3)  # Shorter timeout for faster checking
+                wait = WebDriverWait(driver, 3, poll_frequency=Config.WAIT_POLL_INTERVAL)  # Shorter timeout for faster checking
                 import_element = wait.until(EC.element_to_be_clickable((by_method, selector)))
                 
                 logger.info(f"Found import button: '{import_element.text}', clicking...")
@@ -223,19 +309,16 @@ def find_and_click_import_option(driver):
                 action = ActionChains(driver)
                 action.move_to_element(import_element).pause(0.2).perform()
                 import_element.click()
+                current_span().succeed(selector)
                 
-                # Wait for file dialog to appear
-                time.sleep(1)
-                
-                # Try to find the file input that might appear after clicking
-                try:
-                    file_input = driver.find_element(By.CSS_SELECTOR, "input[type='file']")
+                # Wait for the file input that might appear after clicking
+                file_input = wait_for_file_input(driver)
+                if file_input is not None:
                     logger.info("Found file input after clicking button")
                     return file_input
-                except:
-                    # Return the clicked element
-                    logger.info("No file input found after click, returning clicked element")
-                    return import_element
+                # Return the clicked element
+                logger.info("No file input found after click, returning clicked element")
+                return import_element
             
             except Exception as e:
                 logger.debug(f"Selector {selector} not clickable: {e}")
@@ -247,6 +330,7 @@ def find_and_click_import_option(driver):
     # Special handling for last resort - try JavaScript click on any button with "import" or "file" text
     try:
         logger.info("Trying JavaScript approach to find import button...")
+        current_span().attempt("javascript")
         buttons = driver.execute_script("""
             function containsFileOrImport(text) {
                 if (!text) return false;
@@ -274,14 +358,13 @@ def find_and_click_import_option(driver):
             action = ActionChains(driver)
             action.move_to_element(buttons[0]).pause(0.2).perform()
             buttons[0].click()
-            time.sleep(1)
+            current_span().succeed("javascript")
             
             # Try to find file input after click
-            try:
-                file_input = driver.find_element(By.CSS_SELECTOR, "input[type='file']")
+            file_input = wait_for_file_input(driver)
+            if file_input is not None:
                 return file_input
-            except:
-                return buttons[0]
+            return buttons[0]
     
     except Exception as e:
         logger.error(f"JavaScript approach failed: {e}")
@@ -303,6 +386,7 @@ def upload_image(driver, file_element, image_path):
         # If it's an input element, use send_keys
         if file_element.tag_name.lower() == 'input' and file_element.get_attribute('type') == 'file':
             file_element.send_keys(abs_image_path)
+            current_span().succeed("send_keys")
             logger.info("File upload initiated")
             return True
             
@@ -310,162 +394,263 @@ def upload_image(driver, file_element, image_path):
         else:
             logger.info("Element is not a file input, trying to find one after clicking")
             file_element.click()
-            time.sleep(1)
             
-            try:
-                file_input = driver.find_element(By.CSS_SELECTOR, "input[type='file']")
-                file_input.send_keys(abs_image_path)
-                logger.info("File upload initiated after click")
-                return True
-            except Exception as e:
-                logger.error(f"Failed to find file input after click: {e}")
+            file_input = wait_for_file_input(driver)
+            if file_input is None:
+                logger.error("Failed to find file input after click")
                 return False
+            file_input.send_keys(abs_image_path)
+            current_span().succeed("click_then_send_keys")
+            logger.info("File upload initiated after click")
+            return True
                 
     except Exception as e:
         logger.error(f"Error uploading image: {e}")
         return False
         
-def extract_links_and_descriptions(driver, csv_path):
-    """Extract all non-Google links and their descriptions from the page"""
-    logger.info("Extracting links and descriptions...")
-    
-    # Use a raw string for the JavaScript to avoid Python escape sequence warnings
-    links_with_desc = driver.execute_script(r"""
-        let results = [];
-        
-        // Get all <a> tags on the page
-        let elements = document.getElementsByTagName('a');
-        for (let i = 0; i < elements.length; i++) {
-            let link = elements[i];
-            let href = link.getAttribute('href');
-            
-            if (href && href.startsWith('http')) {
-                let description = '';
-                
-                // Try to get text directly from the link
-                if (link.textContent && link.textContent.trim()) {
-                    description = link.textContent.trim();
-                }
-                // Or from parent element if link has no text
-                else if (link.parentElement && link.parentElement.textContent) {
-                    description = link.parentElement.textContent.trim();
-                }
-                
-                results.push({
-                    url: href,
-                    description: description
-                });
-            }
+# Links to these domains (and their subdomains) are Google's own pages, not results
+GOOGLE_DOMAIN_SUFFIXES = [
+    'google.com', 'gstatic.com', 'googleapis.com', 'chrome.com',
+    'googleusercontent.com',
+]
+
+# Collects result links in page order, deduplicated by normalized URL and filtered by domain suffix.
+# Everything runs in the browser so only the unique external links cross the WebDriver wire.
+EXTRACT_LINKS_SCRIPT = r"""
+    const blockedSuffixes = arguments[0];
+    // Country domains of Google (google.fr, google.co.uk, google.com.au...)
+    const googleCountryDomain = /(^|\.)google\.(com?\.)?[a-z]{2,3}$/;
+    const trackingParam = /^(utm_.*|gclid|fbclid|ved|usg|sa|ei)$/;
+
+    function isBlockedHost(host) {
+        if (googleCountryDomain.test(host)) return true;
+        return blockedSuffixes.some(suffix => host === suffix || host.endsWith('.' + suffix));
+    }
+
+    // Same page whatever the scheme, www prefix, trailing slash, fragment or tracking parameters
+    function normalize(url) {
+        const params = [...url.searchParams.entries()]
+            .filter(([key]) => !trackingParam.test(key))
+            .sort();
+        let path = url.pathname.replace(/\/+$/, '');
+        return url.hostname.replace(/^www\./, '') + path + '?' + new URLSearchParams(params).toString();
+    }
+
+    function hrefOf(el) {
+        if (el.tagName === 'A') {
+            const href = el.getAttribute('href');
+            return href && href.startsWith('http') ? href : null;
         }
-        
-        // Get links from elements that might be clickable but not <a> tags
-        elements = document.querySelectorAll('[onclick], [data-url]');
-        for (let i = 0; i < elements.length; i++) {
-            let el = elements[i];
-            let href = null;
-            
-            // Check onclick attribute
-            if (el.hasAttribute('onclick')) {
-                let onclick = el.getAttribute('onclick');
-                if (onclick && onclick.includes('http')) {
-                    let match = onclick.match(/(https?:\/\/[^'"\s]+)/g);
-                    if (match) href = match[0];
-                }
-            }
-            
-            // Check data-url attribute
-            if (!href && el.hasAttribute('data-url')) {
-                let dataUrl = el.getAttribute('data-url');
-                if (dataUrl && dataUrl.startsWith('http')) {
-                    href = dataUrl;
-                }
-            }
-            
-            if (href) {
-                // Get text from the element
-                let description = el.textContent ? el.textContent.trim() : '';
-                results.push({
-                    url: href,
-                    description: description
-                });
-            }
+        // Elements that might be clickable but not <a> tags
+        const onclick = el.getAttribute('onclick');
+        if (onclick && onclick.includes('http')) {
+            const match = onclick.match(/(https?:\/\/[^'"\s]+)/);
+            if (match) return match[0];
         }
-        
-        return results;
-    """)
-    
-    # Filter out Google domains
-    filtered_results = [
-        item for item in links_with_desc 
-        if not any(domain in item['url'] for domain in [
-            'google.com', 'gstatic.com', 'googleapis.com', 'chrome.com',
-            'google.co', 'googleusercontent.com'
-        ])
-    ]
+        const dataUrl = el.getAttribute('data-url');
+        return dataUrl && dataUrl.startsWith('http') ? dataUrl : null;
+    }
+
+    function descriptionOf(el) {
+        let text = el.textContent ? el.textContent.trim() : '';
+        // Or from parent element if a link has no text
+        if (!text && el.tagName === 'A' && el.parentElement && el.parentElement.textContent) {
+            text = el.parentElement.textContent.trim();
+        }
+        return text;
+    }
+
+    const results = [];
+    const seen = new Map();
+    // querySelectorAll returns elements in document order, which is the ranking on the results page
+    for (const el of document.querySelectorAll('a[href], [onclick], [data-url]')) {
+        const href = hrefOf(el);
+        if (!href) continue;
+        let url;
+        try {
+            url = new URL(href);
+        } catch (e) {
+            continue;
+        }
+        if (isBlockedHost(url.hostname)) continue;
+
+        const key = normalize(url);
+        const description = descriptionOf(el);
+        if (seen.has(key)) {
+            // Keep the first position, but fill in a missing description
+            const existing = seen.get(key);
+            if (!existing.description && description) existing.description = description;
+            continue;
+        }
+        url.hash = '';
+        const item = {url: url.toString(), description: description, rank: results.length + 1};
+        seen.set(key, item);
+        results.push(item);
+    }
+    return results;
+"""
+
+def extract_links_and_descriptions(driver, csv_path=None):
+    """Extract the unique non-Google links and their descriptions from the page, in page order
+    
+    Returns a list of {'url', 'description', 'rank'} dicts, also written to csv_path if given
+    """
+    logger.info("Extracting links and descriptions...")
     
-    logger.info(f"Found {len(filtered_results)} unique external links")
+    links = driver.execute_script(EXTRACT_LINKS_SCRIPT, GOOGLE_DOMAIN_SUFFIXES)
+    
+    logger.info(f"Found {len(links)} unique external links")
+    current_span().details["links"] = len(links)
     
     # Write results to CSV
+    if csv_path:
+        save_links_to_csv(links, csv_path)
+    return links
+
+def save_links_to_csv(links, csv_path):
+    """Write a list of {'url', 'description'} dicts to a results CSV"""
     with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
         writer = csv.writer(csvfile)
         writer.writerow(['URL', 'Description'])  # Header with both columns
-        for item in filtered_results:
+        for item in links:
             writer.writerow([item['url'], item['description']])
     
     logger.info(f"All links saved to {csv_path}")
-    return filtered_results
 
-def run_google_lens_search(image_path, csv_path):
-    """Run a Google Lens search with the provided image and save results to CSV"""
-    driver = setup_anti_detection_driver()
+def get_driver_pool():
+    """Return the shared driver pool, or None if pooling is disabled
+    
+    With TABS_PER_BROWSER > 1 the pool hands out tabs of shared browsers instead of whole browsers
+    """
+    global _driver_pool
+    if Config.DRIVER_POOL_SIZE <= 0:
+        return None
+    with _driver_pool_lock:
+        if _driver_pool is None:
+            if Config.TABS_PER_BROWSER > 1:
+                _driver_pool = TabbedBrowserPool(setup_anti_detection_driver, tab_setup=setup_tab)
+            else:
+                _driver_pool = DriverPool(setup_anti_detection_driver)
+            atexit.register(_driver_pool.close)
+        return _driver_pool
+
+def run_google_lens_search(image_path, csv_path=None, trace=None):
+    """Run a Google Lens search with the provided image
+    
+    Returns the list of result links (also saved to csv_path if given), or None if the search failed.
+    If a LensTrace is given, the timing of every step is recorded in it
+    """
+    if trace is None:
+        trace = LensTrace()
+    pool = get_driver_pool()
+    if pool is None:
+        driver = setup_anti_detection_driver()
+        try:
+            return _run_lens_flow(driver, image_path, csv_path, trace)
+        finally:
+            # Always close the driver
+            logger.info("Closing browser...")
+            driver.quit()
+    
+    with pool.driver() as driver:
+        return _run_lens_flow(driver, image_path, csv_path, trace)
+
+def _upload_via_fast_path(driver, image_path, trace):
+    """Open the Lens upload dialog straight from its URL and upload the image, return True on success"""
+    url = Config.LENS_DIRECT_URL
+    logger.info(f"Opening {url}...")
+    with trace.step("direct_navigate", driver):
+        driver.get(url)
     
-    try:
-        # Start at Google.com
-        url = "https://www.google.com"
-        logger.info(f"Opening {url}...")
+    with trace.step("cookie_consent", driver):
+        handle_cookie_consent(driver)
+    
+    # The dialog carries a file input, no need to click anything
+    with trace.step("direct_upload", driver) as span:
+        locator, file_input = wait_for_any_element(
+            driver,
+            [(By.CSS_SELECTOR, "input[type='file']")],
+            get_wait_budget("import_option")
+        )
+        span.ok = file_input is not None and upload_image(driver, file_input, image_path)
+    return span.ok
+
+def _upload_via_lens_button(driver, image_path, trace):
+    """Open google.com, click the Lens button and the import option, then upload the image"""
+    # Start at Google.com
+    url = "https://www.google.com"
+    logger.info(f"Opening {url}...")
+    with trace.step("navigate", driver):
         driver.get(url)
-        
-        # Handle cookie consent dialog
+    
+    # Handle cookie consent dialog
+    with trace.step("cookie_consent", driver):
         handle_cookie_consent(driver)
-        
-        # Set window size
-        driver.set_window_size(1366, 768)
-        
-        # Wait for page to load completely
+    
+    # Click on Google Lens button, once the page has loaded
+    with trace.step("lens_button", driver) as span:
         wait_for_page_load(driver)
+        span.ok = click_lens_button(driver)
+    if not span.ok:
+        logger.error("Failed to access Google Lens")
+        return False
         
-        # Click on Google Lens button
-        if not click_lens_button(driver):
-            logger.error("Failed to access Google Lens - aborting")
-            return
-            
-        # Wait for Google Lens interface to load
+    # Find and click import option, once the Google Lens interface has loaded
+    with trace.step("import_option", driver) as span:
         wait_for_page_load(driver)
-        
-        # Find and click import option
         file_input = find_and_click_import_option(driver)
+        span.ok = file_input is not None
+    
+    # Upload image file
+    with trace.step("upload_image", driver) as span:
+        span.ok = upload_image(driver, file_input, image_path)
+    if not span.ok:
+        logger.error("Failed to upload image")
+    return span.ok
+
+def _run_lens_flow(driver, image_path, csv_path, trace):
+    """Drive the Google Lens page with an already running driver"""
+    try:
+        # Set window size
+        driver.set_window_size(1366, 768)
+        
+        uploaded = False
+        if Config.LENS_FAST_PATH:
+            start = time.perf_counter()
+            try:
+                uploaded = _upload_via_fast_path(driver, image_path, trace)
+            except Exception as e:
+                logger.warning(f"Lens fast path raised: {e}")
+            logger.info(f"Lens fast path {'succeeded' if uploaded else 'failed'} in {time.perf_counter() - start:.2f}s")
+            if uploaded:
+                trace.path = "fast_path"
         
-        # Upload image file
-        if not upload_image(driver, file_input, image_path):
-            logger.error("Failed to upload image - aborting")
-            return
+        if not uploaded:
+            # Classic route, also the fallback when the fast path fails
+            start = time.perf_counter()
+            uploaded = _upload_via_lens_button(driver, image_path, trace)
+            logger.info(f"Lens button route {'succeeded' if uploaded else 'failed'} in {time.perf_counter() - start:.2f}s")
+            if not uploaded:
+                logger.error("Could not upload the image to Google Lens - aborting")
+                return None
+            trace.path = "lens_button"
             
-        # Wait for search results to load
+        # Wait for search results to load: the number of result links must stop growing
         logger.info("Waiting for search results...")
-        time.sleep(5)  # Initial wait
-        wait_for_page_load(driver)
+        with trace.step("results", driver) as span:
+            span.ok = wait_for_link_count_stable(driver, get_wait_budget("results"))
+            span.succeed("links_stable" if span.ok else "budget_exhausted")
+            wait_for_dom_quiet(driver, get_wait_budget("dom_quiet"))
         
         # Extract all links and descriptions
-        extract_links_and_descriptions(driver, csv_path)
-        return True
+        with trace.step("extract_links", driver):
+            return extract_links_and_descriptions(driver, csv_path)
         
     except Exception as e:
         logger.error(f"Error in Google Lens search: {e}")
-        return False
+        return None
     finally:
-        # Always close the driver
-        logger.info("Closing browser...")
-        driver.quit()
+        logger.info(f"Lens trace {trace.trace_id} ({trace.path}): {trace.summary()}")
 
 # Module can be run independently
 if __name__ == "__main__":
@@ -490,9 +675,9 @@ if __name__ == "__main__":
     
     # Run search
     logger.info(f"Running Google Lens search on {args.image}")
-    success = run_google_lens_search(args.image, args.output)
+    links = run_google_lens_search(args.image, args.output)
     
-    if success:
+    if links is not None:
         logger.info(f"Success! Results saved to {args.output}")
     else:
         logger.error("Search failed")
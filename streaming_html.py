@@ -0,0 +1,72 @@
+import codecs
+import logging
+import time
+from text_extractors import get_extractor
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Content types worth parsing, anything else (PDF, images, video) is rejected from the headers
+TEXT_CONTENT_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain')
+
+def is_text_content_type(content_type):
+    """True if a Content-Type header announces a page we can extract text from (a missing header is accepted)"""
+    if not content_type:
+        return True
+    return content_type.split(';', 1)[0].strip().lower() in TEXT_CONTENT_TYPES
+
+def charset_from_content_type(content_type, default='utf-8'):
+    """Charset of a Content-Type header, or default when it isn't given or unknown"""
+    for param in (content_type or '').split(';')[1:]:
+        key, _, value = param.partition('=')
+        if key.strip().lower() == 'charset':
+            charset = value.strip().strip('"\'')
+            try:
+                codecs.lookup(charset)
+                return charset
+            except LookupError:
+                break
+    return default
+
+class StreamingTextCollector:
+    """Feeds a response body chunk by chunk to the text extractor, until enough text or max_bytes were read"""
+
+    def __init__(self, content_type=None, max_chars=None, max_bytes=None, extractor=None):
+        self.max_bytes = max_bytes
+        self.extractor = get_extractor(extractor)(max_chars)
+        self._decoder = codecs.getincrementaldecoder(charset_from_content_type(content_type))(errors='replace')
+        self.bytes_read = 0
+        self.parse_time = 0.0
+        self.truncated = False
+
+    @property
+    def done(self):
+        return self.extractor.enough or self.truncated
+
+    @property
+    def complete(self):
+        """False when the text stopped at max_chars, the page has more (reading it again gives the same text)"""
+        return not self.extractor.enough
+
+    def feed(self, chunk):
+        """Parse one chunk of the body, return True when no more chunks are needed"""
+        if self.max_bytes is not None and self.bytes_read + len(chunk) > self.max_bytes:
+            chunk = chunk[:self.max_bytes - self.bytes_read]
+            self.truncated = True
+        self.bytes_read += len(chunk)
+        start = time.perf_counter()
+        self.extractor.feed(self._decoder.decode(chunk))
+        self.parse_time += time.perf_counter() - start
+        return self.done
+
+    def get_text(self):
+        """Flush the extractor and return the collected text"""
+        start = time.perf_counter()
+        self.extractor.feed(self._decoder.decode(b'', final=True))
+        text = self.extractor.close()
+        self.parse_time += time.perf_counter() - start
+        return text
+
+    def log_stats(self, url):
+        reason = "char limit reached" if self.extractor.enough else "byte cap reached" if self.truncated else "full page"
+        logger.info(f"Read {self.bytes_read} bytes from {url} ({reason}), parsed in {self.parse_time * 1000:.1f} ms")
@@ -0,0 +1,315 @@
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.remote.command import Command
+from config import Config
+from driver_pool import launch_with_profile, profile_reset_due, wipe_profile
+from page_readiness import get_wait_budget
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# driver.get is replaced by a navigation started from a script, then polled until the new
+# document is interactive (the 'eager' load strategy), so the lock isn't held during the load
+NAVIGATE_SCRIPT = "window.__tabNavigating = true; window.location.href = arguments[0];"
+NAVIGATED_SCRIPT = "return window.__tabNavigating === undefined && document.readyState !== 'loading';"
+
+class TabbedBrowser:
+    """One Chrome instance whose tabs are driven by different threads
+
+    A WebDriver session can only talk to one tab at a time, so every command goes
+    through a lock and the session is switched to the calling thread's tab first.
+    The window switch and the command must not be split, so the lock is held for the
+    whole command. Navigations are the exception: they are started with a script and
+    their load is polled with short commands. Page loads, uploads and result rendering
+    thus run in all tabs at once. A click that starts a navigation still waits for it
+    under the lock (at most the eager load of one page).
+    """
+
+    def __init__(self, driver, tabs, tab_setup=None, slot=0):
+        self.driver = driver
+        # Pool slot, also the key of the browser's persistent profile
+        self.slot = slot
+        # Called on each new tab, for settings that don't carry over between tabs
+        self.tab_setup = tab_setup
+        self.retired = False
+        # Set when the profile is due for a reset: no new leases, recycled once the last tab is back
+        self.draining = False
+        self.leased = 0
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._current_handle = driver.current_window_handle
+        self._execute = driver.execute
+        # Route every command of this driver (including WebElement and ActionChains ones)
+        driver.execute = self._routed_execute
+
+        self.handles = [self._current_handle]
+        for _ in range(tabs - 1):
+            self.handles.append(self._open_tab())
+
+    def _open_tab(self):
+        """Open a new tab from the current one and return its handle"""
+        self.driver.switch_to.new_window('tab')
+        if self.tab_setup is not None:
+            self.tab_setup(self.driver)
+        return self.driver.current_window_handle
+
+    def _routed_execute(self, driver_command, params=None):
+        if driver_command == Command.GET:
+            return self._navigate(params["url"])
+        with self._lock:
+            handle = getattr(self._local, "handle", None)
+            if handle is not None and handle != self._current_handle:
+                self._execute(Command.SWITCH_TO_WINDOW, {"handle": handle})
+                self._current_handle = handle
+            response = self._execute(driver_command, params)
+            if driver_command == Command.SWITCH_TO_WINDOW:
+                self._current_handle = params["handle"]
+            return response
+
+    def _navigate(self, url):
+        """driver.get without holding the lock while the page loads"""
+        self._routed_execute(Command.W3C_EXECUTE_SCRIPT, {"script": NAVIGATE_SCRIPT, "args": [url]})
+        timeout = get_wait_budget("page_load")
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                response = self._routed_execute(Command.W3C_EXECUTE_SCRIPT, {"script": NAVIGATED_SCRIPT, "args": []})
+                if response.get("value"):
+                    return {"value": None}
+            except WebDriverException as e:
+                # The script can land while the old document is being swapped out
+                logger.debug(f"Navigation check failed, retrying: {e}")
+            time.sleep(Config.WAIT_POLL_INTERVAL)
+        raise TimeoutException(f"Page {url} still loading after {timeout}s")
+
+    @contextmanager
+    def use_tab(self, handle):
+        """Make every command of the current thread go to the given tab"""
+        self._local.handle = handle
+        try:
+            yield self.driver
+        finally:
+            self._local.handle = None
+
+    def is_healthy(self, handle):
+        try:
+            with self.use_tab(handle) as driver:
+                driver.execute_script("return 1")
+            return True
+        except Exception as e:
+            logger.warning(f"Tab failed health check: {e}")
+            return False
+
+    def replace_tab(self, handle):
+        """Close a crashed tab and open a fresh one in its place, returning the new handle"""
+        with self._lock:
+            others = [h for h in self.handles if h != handle]
+            try:
+                self.driver.switch_to.window(handle)
+                self.driver.close()
+            except Exception as e:
+                logger.debug(f"Error while closing crashed tab: {e}")
+            # New tabs are opened from a live one
+            self.driver.switch_to.window(others[0])
+            new_handle = self._open_tab()
+            self.handles[self.handles.index(handle)] = new_handle
+            return new_handle
+
+    def reset_tab(self, handle):
+        """Bring a tab back to a blank page before the next search"""
+        with self.use_tab(handle) as driver:
+            driver.get("about:blank")
+
+    def quit(self):
+        self.retired = True
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.debug(f"Error while quitting browser: {e}")
+
+class TabbedBrowserPool:
+    """Hands out tabs of a few shared Chrome instances, one tab per Lens search
+
+    Same interface as DriverPool, so run_google_lens_search can use either.
+    """
+
+    def __init__(self, factory, browsers=None, tabs_per_browser=None, acquire_timeout=None, tab_setup=None):
+        self.factory = factory
+        self.tab_setup = tab_setup
+        self.browsers = browsers if browsers is not None else max(1, Config.DRIVER_POOL_SIZE)
+        self.tabs_per_browser = tabs_per_browser if tabs_per_browser is not None else Config.TABS_PER_BROWSER
+        self.acquire_timeout = acquire_timeout if acquire_timeout is not None else Config.DRIVER_POOL_ACQUIRE_TIMEOUT
+        # Free tabs, as (browser, handle) leases
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._live = []
+        # Slots without a browser, a slot is taken off before its browser is launched
+        self._free_slots = list(range(self.browsers))
+        self._uses = {}  # searches per slot since its profile was last reset
+        self._closed = False
+
+    def _reserve_slot(self):
+        with self._lock:
+            if self._closed or not self._free_slots:
+                return None
+            return self._free_slots.pop(0)
+
+    def _free_slot(self, slot):
+        with self._lock:
+            self._free_slots.append(slot)
+
+    def _launch_browser(self, slot):
+        """Start a browser in a reserved slot and make all its tabs available, the slot is freed on failure"""
+        logger.info(f"Launching a Chrome driver with {self.tabs_per_browser} tabs for pool slot {slot}...")
+        try:
+            driver = launch_with_profile(self.factory, slot)
+            browser = TabbedBrowser(driver, self.tabs_per_browser, self.tab_setup, slot)
+        except Exception:
+            self._free_slot(slot)
+            raise
+        with self._lock:
+            self._live.append(browser)
+        for handle in browser.handles:
+            self._idle.put((browser, handle))
+        return browser
+
+    def _replace_browser(self, browser):
+        """Quit a crashed browser and launch a new one in its place (only once per crash)
+
+        The slot stays reserved from the removal to the relaunch, so fill can't launch it twice.
+        """
+        with self._lock:
+            if browser.retired:
+                return
+            browser.retired = True
+            self._live.remove(browser)
+        logger.warning("Replacing crashed tabbed browser")
+        browser.quit()
+        try:
+            self._launch_browser(browser.slot)
+        except Exception as e:
+            # The slot is free again, acquire refills it when it finds no free tab
+            logger.error(f"Could not relaunch the browser of pool slot {browser.slot}: {e}")
+
+    def _recycle_browser(self, browser):
+        """Quit a browser whose profile is due for a reset, wipe the profile and launch a new one"""
+        with self._lock:
+            if browser.retired:
+                return
+            browser.retired = True
+            self._live.remove(browser)
+            uses, self._uses[browser.slot] = self._uses[browser.slot], 0
+        browser.quit()
+        wipe_profile(browser.slot, uses)
+        try:
+            self._launch_browser(browser.slot)
+        except Exception as e:
+            logger.error(f"Could not relaunch the browser of pool slot {browser.slot} after its profile reset: {e}")
+
+    def _lease(self, browser, handle):
+        with self._lock:
+            browser.leased += 1
+        return browser, handle
+
+    def _recover(self, browser, handle):
+        """Replace a crashed tab, or the whole browser if it is gone, and return a fresh lease if possible"""
+        try:
+            new_handle = browser.replace_tab(handle)
+            logger.warning("Replaced crashed browser tab")
+            return browser, new_handle
+        except Exception as e:
+            logger.warning(f"Could not replace tab, relaunching its browser: {e}")
+            self._replace_browser(browser)
+            return None
+
+    def fill(self):
+        """Launch a browser in every free slot now, so the first request doesn't pay for it"""
+        while True:
+            slot = self._reserve_slot()
+            if slot is None:
+                break
+            try:
+                self._launch_browser(slot)
+            except Exception as e:
+                logger.error(f"Could not launch a browser while filling the tab pool: {e}")
+                break
+        logger.info(f"Tab pool ready with {self._idle.qsize()} idle tab(s)")
+
+    def acquire(self):
+        """Get a (browser, handle) lease on a healthy tab"""
+        with self._lock:
+            missing = bool(self._free_slots)
+        # Launch the browsers not started yet, or lost to a failed relaunch, when no tab is free
+        if missing and self._idle.empty():
+            self.fill()
+        while True:
+            if self._closed:
+                raise RuntimeError("Tab pool is closed")
+            try:
+                browser, handle = self._idle.get(timeout=self.acquire_timeout)
+            except queue.Empty:
+                raise TimeoutError(f"No browser tab available after {self.acquire_timeout}s")
+            # Tabs of a browser that was replaced, or is about to be, are dropped
+            if browser.retired or browser.draining:
+                continue
+            if browser.is_healthy(handle):
+                return self._lease(browser, handle)
+            lease = self._recover(browser, handle)
+            if lease is not None:
+                return self._lease(*lease)
+
+    def release(self, lease, discard=False):
+        browser, handle = lease
+        with self._lock:
+            browser.leased -= 1
+            self._uses[browser.slot] = self._uses.get(browser.slot, 0) + 1
+            if profile_reset_due(browser.slot, self._uses[browser.slot]):
+                browser.draining = True
+            recycle = browser.draining and browser.leased == 0
+        if browser.retired or self._closed:
+            return
+        if browser.draining:
+            # The tab is dropped, the last one back recycles the browser
+            if recycle:
+                self._recycle_browser(browser)
+            return
+        if discard:
+            lease = self._recover(browser, handle)
+            if lease is not None:
+                self._idle.put(lease)
+            return
+        try:
+            browser.reset_tab(handle)
+        except Exception as e:
+            logger.warning(f"Could not reset tab: {e}")
+            lease = self._recover(browser, handle)
+            if lease is not None:
+                self._idle.put(lease)
+            return
+        self._idle.put(lease)
+
+    @contextmanager
+    def driver(self):
+        """Borrow a tab for the duration of a with block, yielding its routed driver"""
+        lease = self.acquire()
+        browser, handle = lease
+        try:
+            with browser.use_tab(handle) as driver:
+                yield driver
+        except BaseException:
+            self.release(lease, discard=not browser.is_healthy(handle))
+            raise
+        else:
+            self.release(lease)
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            browsers, self._live = self._live, []
+        for browser in browsers:
+            browser.quit()
+        logger.info("Tab pool closed")
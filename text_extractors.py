@@ -0,0 +1,234 @@
+import logging
+from abc import ABC, abstractmethod
+from html.parser import HTMLParser
+from bs4 import BeautifulSoup
+from config import Config
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Elements whose text never ends up in the summary (BeautifulSoup also leaves template content out of get_text)
+SKIPPED_TAGS = {'script', 'style', 'header', 'footer', 'nav', 'template'}
+
+
+class VisibleTextCollector:
+    """Collects the visible text from start/end/data events, the same text extract_text_from_html returns
+
+    The methods follow the lxml parser target interface, so it can be used as one.
+    """
+
+    def __init__(self, max_chars=None):
+        self.max_chars = max_chars
+        self.words = []
+        self.length = 0  # length of ' '.join(self.words)
+        self._full = False  # no room left for another word
+        self._skip_depth = 0
+        self._pending = ''  # text that may continue in the next chunk
+
+    @property
+    def enough(self):
+        """True once max_chars of text have been collected"""
+        return self._full or (self.max_chars is not None and self.length >= self.max_chars)
+
+    def start(self, tag, attrib=None):
+        self._flush()
+        if tag in SKIPPED_TAGS:
+            self._skip_depth += 1
+
+    def end(self, tag):
+        self._flush()
+        if tag in SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def data(self, data):
+        if self._skip_depth or self.enough:
+            return
+        # A text node can be split across chunks, keep its last word until we know it's complete.
+        # Only the new chunk is searched, so a long text node isn't scanned again on each chunk.
+        cut = max(data.rfind(' '), data.rfind('\n'), data.rfind('\t'))
+        if cut >= 0:
+            self._add_words(self._pending + data[:cut])
+            self._pending = data[cut:]
+            return
+        self._pending += data
+        # Text without whitespace (CJK, base64, minified code) is one word, cut as soon as it fills the budget
+        if self.max_chars is not None and len(self._pending) >= self.max_chars - self.length:
+            self._flush()
+
+    def _flush(self):
+        self._add_words(self._pending)
+        self._pending = ''
+
+    def _add_words(self, text):
+        for word in text.split():
+            if self.enough:
+                break
+            separator = 1 if self.words else 0
+            if self.max_chars is not None:
+                # The last word is cut to the budget
+                room = self.max_chars - self.length - separator
+                if room <= 0:
+                    self._full = True
+                    break
+                word = word[:room]
+            self.length += len(word) + separator
+            self.words.append(word)
+
+    def close(self):
+        self._flush()
+        return self.get_text()
+
+    def get_text(self):
+        return ' '.join(self.words)
+
+
+class TextExtractor(ABC):
+    """Extractor interface: feed() the decoded page in chunks, close() returns its visible text"""
+
+    def __init__(self, max_chars=None):
+        self.max_chars = max_chars
+
+    @property
+    def enough(self):
+        """True once max_chars of text have been collected, the rest of the page can be skipped"""
+        return False
+
+    @abstractmethod
+    def feed(self, text):
+        """Parse the next chunk of the decoded page"""
+
+    @abstractmethod
+    def close(self):
+        """Finish parsing and return the visible text"""
+
+    @classmethod
+    def extract(cls, html):
+        """Return the visible text of a whole document"""
+        extractor = cls()
+        extractor.feed(html)
+        return extractor.close()
+
+class BeautifulSoupExtractor(TextExtractor):
+    """BeautifulSoup with html.parser, the reference output. Not incremental: parses the page on close"""
+
+    def __init__(self, max_chars=None):
+        super().__init__(max_chars)
+        self._chunks = []
+
+    def feed(self, text):
+        self._chunks.append(text)
+
+    def close(self):
+        return self.extract(''.join(self._chunks))
+
+    @classmethod
+    def extract(cls, html):
+        # Parse with BeautifulSoup
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        # Remove script and style tags
+        for script_or_style in soup(['script', 'style', 'header', 'footer', 'nav']):
+            script_or_style.decompose()
+        
+        # Get text and clean it up
+        text = soup.get_text(separator=' ', strip=True)
+        
+        # Remove extra whitespace and normalize
+        return ' '.join(text.split())
+
+class HtmlParserExtractor(TextExtractor):
+    """Pure-Python incremental parser (html.parser), stops collecting at max_chars"""
+
+    def __init__(self, max_chars=None):
+        super().__init__(max_chars)
+        self.collector = VisibleTextCollector(max_chars)
+        self._parser = _CollectingHTMLParser(self.collector)
+
+    @property
+    def enough(self):
+        return self.collector.enough
+
+    def feed(self, text):
+        self._parser.feed(text)
+
+    def close(self):
+        self._parser.close()
+        return self.collector.close()
+
+class _CollectingHTMLParser(HTMLParser):
+    """Forwards html.parser events to a VisibleTextCollector"""
+
+    def __init__(self, collector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag)
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+class LxmlExtractor(TextExtractor):
+    """libxml2's C parser. Incremental with a collecting target, whole documents go through the element tree"""
+
+    def __init__(self, max_chars=None):
+        super().__init__(max_chars)
+        self.collector = VisibleTextCollector(max_chars)
+        self._parser = etree.HTMLParser(target=self.collector)
+        self._fed = False
+
+    @property
+    def enough(self):
+        return self.collector.enough
+
+    def feed(self, text):
+        if text:
+            self._parser.feed(text)
+            self._fed = True
+
+    def close(self):
+        if not self._fed:
+            return ''  # libxml2 refuses to close an empty document
+        return self._parser.close()
+
+    @classmethod
+    def extract(cls, html):
+        try:
+            root = etree.fromstring(html, etree.HTMLParser(remove_comments=True))
+        except ValueError:
+            # Strings with an XML encoding declaration are rejected, the feed interface takes them
+            return super().extract(html)
+        if root is None:
+            return ''
+        etree.strip_elements(root, *SKIPPED_TAGS, with_tail=False)
+        return ' '.join(' '.join(root.itertext()).split())
+
+EXTRACTORS = {
+    "bs4": BeautifulSoupExtractor,
+    "stream": HtmlParserExtractor,
+    "lxml": LxmlExtractor,
+}
+
+_warned_missing_lxml = False
+
+def get_extractor(name=None):
+    """Return the extractor class configured by Config.TEXT_EXTRACTOR, falling back to 'stream' without lxml"""
+    if name is None:
+        name = Config.TEXT_EXTRACTOR
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown text extractor '{name}', expected one of {list(EXTRACTORS)}")
+    if name == "lxml" and etree is None:
+        global _warned_missing_lxml
+        if not _warned_missing_lxml:
+            logger.warning("The lxml extractor needs the lxml package (pip install lxml), using 'stream'")
+            _warned_missing_lxml = True
+        name = "stream"
+    return EXTRACTORS[name]
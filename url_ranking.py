@@ -0,0 +1,77 @@
+import logging
+import re
+from config import Config
+from domain_health import domain_of, get_domain_health
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Pages that rarely have text about the image: logins, carts, account pages...
+LOW_VALUE_PATH = re.compile(r'/(log-?in|sign-?in|sign-?up|register|account|cart|checkout|auth)(/|$|\?|\.)', re.IGNORECASE)
+LOW_VALUE_DESCRIPTION = re.compile(r'\b(log ?in|sign ?in|sign ?up|create an account|shopping cart|checkout|'
+                                   r'access denied|page not found|404)\b', re.IGNORECASE)
+
+def _is_low_yield_domain(domain):
+    return any(domain == low or domain.endswith("." + low) for low in Config.LOW_YIELD_DOMAINS)
+
+def score_url(position, url, description, target_chars):
+    """Expected usefulness of fetching a URL, before domain diversity is taken into account
+
+    Starts from the Lens page position and is scaled down for an empty or login-like description,
+    login/cart paths, domains that give little text, and the domain's history of failures or short pages.
+    """
+    score = 1 / (1 + position / Config.URL_RANK_POSITION_DECAY)
+
+    if not description:
+        score *= 0.8
+    elif LOW_VALUE_DESCRIPTION.search(description):
+        score *= 0.3
+    if LOW_VALUE_PATH.search(url):
+        score *= 0.3
+
+    domain = domain_of(url)
+    if _is_low_yield_domain(domain):
+        score *= 0.3
+
+    domain_health = get_domain_health()
+    history = domain_health.yield_of(url) if domain_health else None
+    if history is not None and history[0] >= Config.URL_RANK_MIN_HISTORY:
+        _, success_rate, chars_per_request = history
+        # A domain that always fails ends up at 0.06, one that always gives full pages keeps its score
+        score *= (0.2 + 0.8 * success_rate) * (0.3 + 0.7 * min(1.0, chars_per_request / target_chars))
+    return score
+
+def rank_urls(candidates, primary_count, spare_count, target_chars):
+    """Pick the most promising (url, description) candidates
+
+    Domains are picked greedily, each further URL of an already picked domain has its score
+    multiplied by URL_RANK_DOMAIN_REPEAT_PENALTY. Returns the best primary_count in page order,
+    followed by the next spare_count best, best first.
+    """
+    scored = [
+        (score_url(position, url, description, target_chars), position, url, description)
+        for position, (url, description) in enumerate(candidates)
+    ]
+
+    picked = []
+    domain_counts = {}
+    while scored and len(picked) < primary_count + spare_count:
+        # Re-score against the domains already picked
+        best = max(
+            scored,
+            key=lambda item: (item[0] * Config.URL_RANK_DOMAIN_REPEAT_PENALTY ** domain_counts.get(domain_of(item[2]), 0),
+                              -item[1]),
+        )
+        scored.remove(best)
+        picked.append(best)
+        domain = domain_of(best[2])
+        domain_counts[domain] = domain_counts.get(domain, 0) + 1
+
+    primaries = sorted(picked[:primary_count], key=lambda item: item[1])
+    spares = picked[primary_count:]
+    for score, position, url, _ in primaries + spares:
+        logger.debug(f"Picked {url} (position {position}, score {score:.2f})")
+    replaced = sum(1 for _, position, _, _ in primaries if position >= primary_count)
+    if replaced:
+        logger.info(f"URL ranking replaced {replaced} of the first {primary_count} links with better candidates")
+    return [(url, description) for _, _, url, description in primaries + spares]